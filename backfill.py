@@ -0,0 +1,109 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+Rebuild the data for a range of days.  Usage:
+
+    python backfill.py YYYY-mm-dd YYYY-mm-dd [--workers N] [--rate R]
+                                            [--source SOURCE]
+                                            [--metrics FILE]
+                                            [--profile cpu|memory]
+"""
+import copy
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from get_team_abbrev import get_teams_list
+from get_roto_teams import get_league_team_data, get_weekly_league_file
+from get_day_stats import get_players_on_date
+from get_daily_roto_scores import get_daily_roto_scores
+from gen_html_files import gen_html_files, page_files_wanted
+from season_rollup import fold_day, load_rollup, save_rollup
+from http_policy import set_rate_limit
+import data_store
+import metrics
+
+DAY_WORKERS = 4
+DAY_FETCH_WORKERS = 2
+REQUEST_RATE = 5.0
+
+def get_periods(start, end):
+    """
+    Group the days from start through end by league period
+
+    @param start datetime first day
+    @param end datetime last day
+    @return dict league file name -> list of days in that period
+    """
+    periods = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        periods.setdefault(get_weekly_league_file(day), []).append(day)
+    return periods
+
+def collect_day(day, source=None):
+    """
+    Worker that collects the stats for one day
+
+    @param day datetime day being collected
+    @param source String stats source (see get_day_stats.STATS_SOURCES)
+    @return day
+    """
+    with metrics.timed("backfill", "collect"):
+        get_players_on_date(day, DAY_FETCH_WORKERS, source)
+    return day
+
+def backfill(start, end, workers=DAY_WORKERS, rate=REQUEST_RATE,
+             source=None):
+    """
+    Produce the files for every day from start through end.  Stats for the
+    days are collected in parallel while all requests share one rate cap.
+    Each period's league file is scraped and read once.
+
+    @param start datetime first day
+    @param end datetime last day
+    @param workers int number of days collected at the same time
+    @param rate float maximum http requests per second
+    @param source String stats source (see get_day_stats.STATS_SOURCES;
+           roto.ini setting if None)
+    """
+    set_rate_limit(rate)
+    get_teams_list()
+    periods = get_periods(start, end)
+    for days in periods.values():
+        get_league_team_data(days[0])
+    all_days = [day for days in periods.values() for day in days]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for day in pool.map(collect_day, all_days,
+                            [source] * len(all_days)):
+            print("Collected", day.strftime("%Y-%m-%d"))
+    rollup = load_rollup()
+    for lfile, days in periods.items():
+        rleague = data_store.load(lfile)
+        for day in days:
+            with metrics.timed("backfill", "join"):
+                get_daily_roto_scores(day, copy.deepcopy(rleague))
+            with metrics.timed("backfill", "rollup"):
+                fold_day(day, rollup)
+            if page_files_wanted():
+                with metrics.timed("backfill", "html"):
+                    gen_html_files(day)
+    save_rollup(rollup)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("start")
+    parser.add_argument("end")
+    parser.add_argument("--workers", type=int, default=DAY_WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUEST_RATE)
+    parser.add_argument("--source")
+    parser.add_argument("--metrics", default=metrics.METRICS_FILE)
+    parser.add_argument("--profile", choices=["cpu", "memory"])
+    args = parser.parse_args()
+    try:
+        metrics.profile_call(args.profile, backfill,
+                             datetime.strptime(args.start, "%Y-%m-%d"),
+                             datetime.strptime(args.end, "%Y-%m-%d"),
+                             args.workers, args.rate, args.source)
+    finally:
+        metrics.write_metrics(args.metrics)
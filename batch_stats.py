@@ -0,0 +1,145 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+batch_stats -- compute rate stats (AVG, ERA, WHIP, K/9), their adjusted
+versions, and team aggregates for many players at once with numpy arrays.
+A rate with a zero denominator is nan (0/0) or inf (x/0).  numpy is
+imported when rates are first computed, not when the module is loaded.
+"""
+import math
+
+BAT_FIELDS = ["ab", "hits"]
+PIT_FIELDS = ["outs", "hits", "earned_runs", "walks", "strikeouts"]
+
+def columns(players, fields):
+    """
+    Convert player stat dicts into one numpy array per field
+
+    @param players list of player stat dicts (missing fields count as 0)
+    @param fields list of field names
+    @return dict field name -> float numpy array (one entry per player)
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    return {field: np.array([float(plyr.get(field, 0)) for plyr in players],
+                            dtype=np.float64)
+            for field in fields}
+
+def ratio(numerator, denominator, scale=1.0):
+    """
+    Divide arrays, giving nan for 0/0 and inf for x/0
+
+    @param numerator numpy array
+    @param denominator numpy array
+    @param scale float multiplier applied to the quotient
+    @return numpy array
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return scale * numerator / denominator
+
+def batting_rates(cols):
+    """
+    Batting average and adjusted batting average
+
+    @param cols dict from columns() with BAT_FIELDS
+    @return dict stat name (avg, w_avg) -> numpy array
+    """
+    return {"avg": ratio(cols["hits"], cols["ab"]),
+            "w_avg": ratio(cols["hits"] + 10, cols["ab"] + 40)}
+
+def pitching_rates(cols):
+    """
+    ERA, WHIP, K/9 and their adjusted versions (3 earned runs, 9 walks plus
+    hits, and 6 strikeouts over 7 innings added to every pitcher)
+
+    @param cols dict from columns() with PIT_FIELDS
+    @return dict stat name -> numpy array
+    """
+    outs = cols["outs"]
+    wlkhts = cols["walks"] + cols["hits"]
+    return {"era": ratio(cols["earned_runs"], outs, 27),
+            "whip": ratio(wlkhts, outs, 3),
+            "k9": ratio(cols["strikeouts"], outs, 27),
+            "w_era": ratio(cols["earned_runs"] + 3, outs + 21, 27),
+            "w_whip": ratio(wlkhts + 9, outs + 21, 3),
+            "w_k9": ratio(cols["strikeouts"] + 6, outs + 21, 27)}
+
+def player_rates(players, kind=None):
+    """
+    Compute rate stats for a dict of players
+
+    @param players dict player key -> player stat dict
+    @param kind String 'bat' or 'pit' if every player is of that kind, or
+           None for batters and pitchers mixed (pitchers are the entries
+           with a save field)
+    @return dict player key -> dict of rate stats (python floats)
+    """
+    retv = {}
+    for pkind, fields, rate_func in [("bat", BAT_FIELDS, batting_rates),
+                                     ("pit", PIT_FIELDS, pitching_rates)]:
+        if kind is None:
+            keys = [pkey for pkey, plyr in players.items()
+                    if ('save' in plyr) == (pkind == "pit")]
+        else:
+            keys = list(players) if kind == pkind else []
+        if not keys:
+            continue
+        rates = rate_func(columns([players[pkey] for pkey in keys], fields))
+        for indx, pkey in enumerate(keys):
+            retv[pkey] = {stat: float(vals[indx])
+                          for stat, vals in rates.items()}
+    return retv
+
+def with_rates(players, kind=None):
+    """
+    Copy player stat dicts with their rate stats added (the batch version
+    of find_unclaimed.proc_bat and proc_pit)
+
+    @param players dict player key -> player stat dict
+    @param kind String 'bat' or 'pit' (None to tell them apart by the save
+           field)
+    @return dict player key -> copy of stat dict with rate stats added
+    """
+    rates = player_rates(players, kind)
+    retv = {}
+    for pkey, plyr in players.items():
+        retv[pkey] = plyr.copy()
+        retv[pkey].update(rates[pkey])
+    return retv
+
+def team_rates(teams):
+    """
+    Aggregate players into teams and compute team rate stats
+
+    @param teams dict team name -> dict with 'batting' and 'pitching'
+           totals (as kept by season_rollup)
+    @return dict team name -> dict of rate stats
+    """
+    names = list(teams)
+    if not names:
+        return {}
+    rates = batting_rates(columns([teams[name]['batting'] for name in names],
+                                  BAT_FIELDS))
+    rates.update(pitching_rates(columns(
+        [teams[name]['pitching'] for name in names], PIT_FIELDS)))
+    return {name: {stat: float(vals[indx]) for stat, vals in rates.items()}
+            for indx, name in enumerate(names)}
+
+def format_rate(value, digits, strip_zero=False):
+    """
+    Format a rate stat for display
+
+    @param value float rate
+    @param digits int digits after the decimal point
+    @param strip_zero boolean drop the leading 0 (batting average style)
+    @return String formatted value ('-' for 0/0, 'INF' for x/0)
+    """
+    if math.isnan(value):
+        return "-"
+    if math.isinf(value):
+        return "INF"
+    retv = format(round(value, digits), f".{digits}f")
+    if strip_zero:
+        retv = retv.lstrip('0')
+    return retv
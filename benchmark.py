@@ -0,0 +1,209 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+Time the scraping, scoring and page generating code without network
+access.  Usage:
+
+    python benchmark.py [--days N] [--teams T] [--games G] [--roto R]
+                        [--repeat K] [--save FILE] [--baseline FILE]
+    python benchmark.py --recorded YYYY-mm-dd [...]
+
+By default pages are generated with synthetic_data in a scratch directory.
+With --recorded the pages saved in data/http_cache by earlier runs for
+that date are replayed instead (data/abbreviations.json and the league
+file for the date must exist).  Every page is read in offline mode.
+
+The standings and team roster pages are read through the logged in league
+session (get_roto_teams), which does not use the page cache, so they are
+never recorded.  parse_team_page is therefore only timed on synthetic
+pages; a --recorded run skips the roster stage and uses the saved league
+file instead.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+import page_fetch
+from page_fetch import set_offline
+from get_day_stats import get_games_on_date, extract_raw_data
+from get_day_stats import process_raw_data, update_stolen_bases
+from get_daily_roto_scores import get_daily_roto_scores
+from get_roto_teams import get_weekly_league_file, parse_team_page
+from get_roto_teams import get_team_links
+from gen_html_files import gen_html_files
+from find_unclaimed import get_free_agents
+from synthetic_data import make_season
+import data_store
+
+SEASON_START = datetime(2022, 4, 7)
+FUNCTIONS = ["parse_team_page", "extract_raw_data", "process_raw_data",
+             "update_stolen_bases", "get_daily_roto_scores",
+             "gen_html_files", "get_free_agents"]
+
+def timed_call(timings, name, func, *args):
+    """
+    Call a function with its output suppressed and add its run time to
+    timings
+
+    @param timings dict function name -> dict with calls and seconds
+    @param name String function name
+    @param func function to call
+    @param args arguments passed to func
+    @return value returned by func
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        retv = func(*args)
+        elapsed = time.perf_counter() - start
+    entry = timings.setdefault(name, {"calls": 0, "seconds": 0.0})
+    entry["calls"] += 1
+    entry["seconds"] += elapsed
+    return retv
+
+def bench_rosters(timings, fixtures):
+    """
+    Time the parsing of the standings and team roster pages
+
+    @param timings dict collected timings
+    @param fixtures dict returned by synthetic_data.make_season
+    """
+    get_team_links(page_fetch.get_page(fixtures["standings"]))
+    for tname, turl in fixtures["team_pages"]:
+        timed_call(timings, "parse_team_page", parse_team_page,
+                   page_fetch.get_page(turl), tname)
+
+def bench_day(timings, day, links):
+    """
+    Time the per day functions for one day
+
+    @param timings dict collected timings
+    @param day datetime day
+    @param links list of boxscore links for the day
+    """
+    stats = {}
+    for link in links:
+        raw_data = timed_call(timings, "extract_raw_data", extract_raw_data,
+                              link)
+        records = timed_call(timings, "process_raw_data", process_raw_data,
+                             raw_data)
+        sbinfo = raw_data[-1]
+        if len(sbinfo) > 1:
+            timed_call(timings, "update_stolen_bases", update_stolen_bases,
+                       records, sbinfo[1:(len(sbinfo) - 1) // 2 + 1])
+        stats.update(records)
+    txt_day = day.strftime("%Y%m%d")
+    data_store.save(os.sep.join(["data", f"stats_on_{txt_day}.json"]),
+                    json.loads(json.dumps(stats)))
+    timed_call(timings, "get_daily_roto_scores", get_daily_roto_scores, day)
+    timed_call(timings, "get_free_agents", get_free_agents, day)
+    timed_call(timings, "gen_html_files", gen_html_files, day)
+
+def run_suite(args, workdir):
+    """
+    Set up the pages in a scratch directory and time every function once
+
+    @param args argparse namespace
+    @param workdir String scratch directory (the current directory while
+           the suite runs)
+    @return dict function name -> dict with calls and seconds
+    """
+    timings = {}
+    if args.recorded:
+        day = datetime.strptime(args.recorded, "%Y-%m-%d")
+        source = os.path.join(args.source, "data")
+        os.makedirs("data")
+        for fname in ["abbreviations.json",
+                      os.path.basename(get_weekly_league_file(day))]:
+            shutil.copy(os.path.join(source, fname), "data")
+        page_fetch.CACHE_SETTINGS["directory"] = os.path.join(source,
+                                                              "http_cache")
+        set_offline(True)
+        fixtures = {"days": [day],
+                    "boxscores": {day: get_games_on_date(day)}}
+        print("Roster pages are not recorded: parse_team_page is not timed")
+    else:
+        fixtures = make_season(SEASON_START, args.days, args.teams,
+                               args.games, args.roto)
+        set_offline(True)
+        bench_rosters(timings, fixtures)
+    shutil.copy(os.path.join(args.source, "tablehtml.txt"), workdir)
+    for day in fixtures["days"]:
+        bench_day(timings, day, fixtures["boxscores"][day])
+    return timings
+
+def report(best, baseline=None):
+    """
+    Print a table of timings
+
+    @param best dict function name -> dict with calls and seconds
+    @param baseline dict of earlier timings to compare against (optional)
+    """
+    print(f"{'function':24}{'calls':>8}{'total s':>12}{'per call ms':>14}"
+          f"{'vs base':>10}")
+    for name in FUNCTIONS:
+        if name not in best:
+            continue
+        entry = best[name]
+        per_call = 1000 * entry["seconds"] / entry["calls"]
+        ratio = ""
+        if baseline and name in baseline:
+            base = baseline[name]
+            base_call = 1000 * base["seconds"] / base["calls"]
+            ratio = f"{per_call / base_call:.2f}x" if base_call else ""
+        print(f"{name:24}{entry['calls']:>8}{entry['seconds']:>12.3f}"
+              f"{per_call:>14.3f}{ratio:>10}")
+
+def main(args):
+    """
+    Run the suite args.repeat times and keep the fastest time for each
+    function
+
+    @param args argparse namespace
+    @return dict best timings
+    """
+    best = {}
+    home = os.getcwd()
+    for _ in range(args.repeat):
+        workdir = tempfile.mkdtemp(prefix="roto_bench_")
+        os.chdir(workdir)
+        page_fetch.CACHE_SETTINGS["directory"] = os.sep.join(
+            ["data", "http_cache"])
+        try:
+            timings = run_suite(args, workdir)
+        finally:
+            os.chdir(home)
+            shutil.rmtree(workdir, ignore_errors=True)
+        for name, entry in timings.items():
+            if name not in best or entry["seconds"] < best[name]["seconds"]:
+                best[name] = entry
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf8") as bfile:
+            baseline = json.load(bfile)
+    report(best, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf8") as sfile:
+            json.dump(best, sfile, indent=4)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--teams", type=int, default=30)
+    parser.add_argument("--games", type=int, default=15)
+    parser.add_argument("--roto", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--recorded")
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    parser.add_argument("--source", default=os.path.dirname(
+        os.path.abspath(sys.argv[0])))
+    main(parser.parse_args())
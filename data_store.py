@@ -0,0 +1,112 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+data_store -- read and write the data/*.json files through the storage
+backend selected in roto.ini (storage = json, the default, or sqlite).
+Callers always use the json file name; the sqlite backend maps it to a
+table in data/roto.db.
+"""
+import os
+import json
+import hashlib
+from configparser import ConfigParser
+
+STORE_SETTINGS = {}
+
+def get_backend():
+    """
+    Get the storage backend named in roto.ini
+
+    @return String json or sqlite
+    """
+    if "backend" not in STORE_SETTINGS:
+        config = ConfigParser()
+        config.read('roto.ini')
+        STORE_SETTINGS["backend"] = config["DEFAULT"].get("storage", "json")
+    return STORE_SETTINGS["backend"]
+
+def exists(fname):
+    """
+    Check if a data file exists
+
+    @param fname String data file name
+    @return boolean
+    """
+    if get_backend() == "sqlite":
+        import roto_db  # pylint: disable=import-outside-toplevel
+        return roto_db.exists(fname)
+    return os.path.exists(fname)
+
+def load(fname):
+    """
+    Read a data file
+
+    @param fname String data file name
+    @return contents of the data file
+    """
+    if get_backend() == "sqlite":
+        import roto_db  # pylint: disable=import-outside-toplevel
+        return roto_db.load(fname)
+    with open(fname, "r", encoding="utf8") as dfile:
+        return json.load(dfile)
+
+def save(fname, data):
+    """
+    Write a data file
+
+    @param fname String data file name
+    @param data json serializable contents of the file
+    """
+    if get_backend() == "sqlite":
+        import roto_db  # pylint: disable=import-outside-toplevel
+        roto_db.save(fname, data)
+        return
+    with open(fname + ".tmp", "w", encoding="utf8") as dfile:
+        json.dump(data, dfile, indent=4)
+    os.replace(fname + ".tmp", fname)
+
+def remove(fname):
+    """
+    Delete a data file if it exists
+
+    @param fname String data file name
+    """
+    if get_backend() == "sqlite":
+        import roto_db  # pylint: disable=import-outside-toplevel
+        roto_db.remove(fname)
+        return
+    if os.path.exists(fname):
+        os.remove(fname)
+
+def list_files(dirname, prefix=""):
+    """
+    List the data files stored in a directory
+
+    @param dirname String directory (data, data/<league>, ...)
+    @param prefix String only list files whose names start with this
+    @return sorted list of data file names (empty if there are none)
+    """
+    if get_backend() == "sqlite":
+        import roto_db  # pylint: disable=import-outside-toplevel
+        return roto_db.list_files(dirname, prefix)
+    if not os.path.isdir(dirname):
+        return []
+    return sorted(os.sep.join([dirname, fname])
+                  for fname in os.listdir(dirname)
+                  if fname.startswith(prefix) and fname.endswith(".json"))
+
+def digest(fname):
+    """
+    Hash the contents of a data file
+
+    @param fname String data file name
+    @return String hex digest (None if the file does not exist)
+    """
+    if not exists(fname):
+        return None
+    if get_backend() == "sqlite":
+        text = json.dumps(load(fname), sort_keys=True).encode("utf-8")
+        return hashlib.sha256(text).hexdigest()
+    with open(fname, "rb") as dfile:
+        return hashlib.sha256(dfile.read()).hexdigest()
@@ -5,27 +5,28 @@
 generate free_agent data to be saved in files created by gen_html
 """
 import os
-import json
 from datetime import datetime, timedelta
 from get_roto_teams import get_weekly_league_file
+from batch_stats import with_rates
+import data_store
 
-def find_unclaimed(cdate):
+def find_unclaimed(cdate, ldir="data"):
     """
     Find players who contributed on date specified that are not on the roster
     of any fantasy team in this league
 
     @param cdate datetime curent date
-    @return list of index numbers for free agent players
+    @param ldir String directory holding the league's data files
+    @return set of index numbers for players owned by a fantasy team
     """
-    retv = []
-    taken_file = get_weekly_league_file(cdate)
-    with open(taken_file, "r", encoding="utf8") as taken_fd:
-        taken_info = json.load(taken_fd)
+    retv = set()
+    taken_file = get_weekly_league_file(cdate, ldir)
+    taken_info = data_store.load(taken_file)
     for taken_keys in taken_info:
         for ptype in taken_info[taken_keys]:
             if ptype != "team_name":
                 for plyr in taken_info[taken_keys][ptype]:
-                    retv.append(plyr)
+                    retv.add(plyr)
     return retv
 
 def proc_bat(batter):
@@ -33,58 +34,48 @@ def proc_bat(batter):
     Calculate adjusted batting average for this batter
 
     @param batter dict batter stats
-    @return returns batter dict with w_avg stat added
+    @return returns batter dict with w_avg (and avg) stats added
     """
-    retv = batter.copy()
-    numerator = batter['hits'] + 10
-    denominator = batter['ab'] + 40
-    retv['w_avg'] = numerator / denominator
-    return retv
+    return with_rates({0: batter}, "bat")[0]
 
 def proc_pit(pitcher):
     """
     Calculate adjusted era, whip, and ks/9 for this pitcher
 
     @param pitcher dict pitcher stats
-    @return pitcher dict with w_era, w_whip and w_k9 stats added
+    @return pitcher dict with w_era, w_whip and w_k9 (and era, whip and k9)
+            stats added
     """
-    retv = pitcher.copy()
-    denominator = pitcher['outs'] + 21
-    numerator = (pitcher['earned_runs'] + 3) * 27
-    retv['w_era'] = numerator /  denominator
-    numerator = (pitcher['walks'] + pitcher['hits'] + 9) * 3
-    retv['w_whip'] = numerator / denominator
-    numerator = (pitcher['strikeouts'] + 6) * 27
-    retv['w_k9'] = numerator / denominator
-    return retv
+    return with_rates({0: pitcher}, "pit")[0]
 
-def get_free_agents():
+def get_free_agents(cdate=None, ldir="data"):
     """
-    Scan for free agents that participated in games yesterday.
+    Scan for free agents that participated in games on a day.
 
+    @param cdate datetime day to scan (yesterday if None)
+    @param ldir String directory holding the league's data files
     @return tuple of batter info and pitcher info of contributing free
             agents
     """
-    yesterday = datetime.now() - timedelta(days=1)
-    active = find_unclaimed(yesterday)
-    dpart = yesterday.strftime("%Y%m%d")
+    if cdate is None:
+        cdate = datetime.now() - timedelta(days=1)
+    active = find_unclaimed(cdate, ldir)
+    dpart = cdate.strftime("%Y%m%d")
     fname = os.sep.join(["data", "".join(["stats_on_", dpart, ".json"])])
     pit_info = {}
     bat_info = {}
-    with open(fname, "r", encoding="utf8") as day_fd:
-        day_info = json.load(day_fd)
-    with open(os.sep.join(["data", "abbreviations.json"]), "r",
-                       encoding="utf8") as afile:
-        teamabbrv = json.load(afile)
+    day_info = data_store.load(fname)
+    teamabbrv = data_store.load(os.sep.join([ldir, "abbreviations.json"]))
     for plyr_keys in day_info:
         if day_info[plyr_keys]['team'] not in teamabbrv:
             continue
         if plyr_keys not in active:
             if 'save' not in day_info[plyr_keys]:
-                bat_info[plyr_keys] = proc_bat(day_info[plyr_keys])
+                bat_info[plyr_keys] = day_info[plyr_keys]
             else:
-                pit_info[plyr_keys] = proc_pit(day_info[plyr_keys])
-    return get_with_stats(bat_info, pit_info)
+                pit_info[plyr_keys] = day_info[plyr_keys]
+    return get_with_stats(with_rates(bat_info, "bat"),
+                          with_rates(pit_info, "pit"))
 
 def get_with_stats(bat_info, pit_info):
     """
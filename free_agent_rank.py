@@ -0,0 +1,139 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+free_agent_rank -- rank unowned players in the league's pool over rolling
+windows of days ending on any date, using the adjusted stats from
+find_unclaimed.proc_bat and find_unclaimed.proc_pit (computed in batches
+by batch_stats.with_rates).
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from find_unclaimed import find_unclaimed
+from batch_stats import with_rates
+import data_store
+
+WINDOWS = [1, 7, 14, 30]
+BAT_FIELDS = ["ab", "runs", "hits", "rbis", "hr", "sb"]
+PIT_FIELDS = ["outs", "hits", "earned_runs", "walks", "strikeouts", "win",
+              "save"]
+DAY_CACHE_SIZE = 64
+DAY_CACHE = OrderedDict()
+DAY_LOCK = threading.Lock()
+
+def day_stats(txt_day):
+    """
+    Read the stats for one day.  Files read are cached by content hash so
+    that overlapping windows and consecutive end dates only parse each day
+    once, while a rewritten file is read again.  Missing files are not
+    cached.
+
+    @param txt_day String YYYYmmdd
+    @return dict stats_on_*.json contents (empty if there is no file), a
+            copy the caller may change
+    """
+    fname = os.sep.join(["data", f"stats_on_{txt_day}.json"])
+    fhash = data_store.digest(fname)
+    if fhash is None:
+        return {}
+    with DAY_LOCK:
+        cached = DAY_CACHE.get(txt_day)
+        if cached and cached[0] == fhash:
+            DAY_CACHE.move_to_end(txt_day)
+            precords = cached[1]
+        else:
+            precords = data_store.load(fname)
+            DAY_CACHE[txt_day] = (fhash, precords)
+            DAY_CACHE.move_to_end(txt_day)
+            while len(DAY_CACHE) > DAY_CACHE_SIZE:
+                DAY_CACHE.popitem(last=False)
+    return {pkey: dict(pstats) for pkey, pstats in precords.items()}
+
+def add_day(totals, precords, owned, teamabbrv):
+    """
+    Add one day's stats for unowned pool players to running totals
+
+    @param totals dict (player number, 'bat' or 'pit') -> totals
+    @param precords dict stats for one day
+    @param owned set of player numbers on a fantasy roster
+    @param teamabbrv set of team abbreviations in the player pool
+    """
+    for pkey, pstats in precords.items():
+        if pkey in owned or pstats['team'] not in teamabbrv:
+            continue
+        ptype = 'pit' if 'save' in pstats else 'bat'
+        fields = PIT_FIELDS if ptype == 'pit' else BAT_FIELDS
+        entry = totals.get((pkey, ptype))
+        if entry is None:
+            entry = {"name": pstats['name'], "team": pstats['team'],
+                     "pos": pstats['pos'], "games": 0}
+            for field in fields:
+                entry[field] = 0
+            totals[(pkey, ptype)] = entry
+        for field in fields:
+            entry[field] += int(pstats[field])
+        entry["games"] += 1
+
+def rank_pitchers(pitchers):
+    """
+    Order pitchers by the sum of their ranks in w_era, w_whip and w_k9
+
+    @param pitchers dict player number -> stats with adjusted stats
+    @return list of (player number, stats) best first
+    """
+    rank_sum = {pkey: 0 for pkey in pitchers}
+    for stat, best_low in [("w_era", True), ("w_whip", True),
+                           ("w_k9", False)]:
+        order = sorted(pitchers, key=lambda p, s=stat: pitchers[p][s],
+                       reverse=not best_low)
+        for rank, pkey in enumerate(order):
+            rank_sum[pkey] += rank
+    return [(pkey, pitchers[pkey])
+            for pkey in sorted(rank_sum, key=lambda p: (rank_sum[p], p))]
+
+def rank_free_agents(end_date, windows=None):
+    """
+    Rank free agents over rolling windows ending on end_date.  Ownership
+    comes from the rosters of end_date's period.
+
+    @param end_date datetime last day of every window
+    @param windows list of int window lengths in days (WINDOWS if None)
+    @return dict window length -> tuple (batters, pitchers), each a list of
+            (player number, stats with adjusted stats added), best first
+    """
+    windows = sorted(windows or WINDOWS)
+    owned = find_unclaimed(end_date)
+    teamabbrv = set(data_store.load(os.sep.join(["data",
+                                                 "abbreviations.json"])))
+    totals = {}
+    retv = {}
+    for offset in range(windows[-1]):
+        txt_day = (end_date - timedelta(days=offset)).strftime("%Y%m%d")
+        add_day(totals, day_stats(txt_day), owned, teamabbrv)
+        if offset + 1 in windows:
+            batters = with_rates({pkey: entry for (pkey, ptype), entry
+                                  in totals.items() if ptype == 'bat'}, "bat")
+            pitchers = with_rates({pkey: entry for (pkey, ptype), entry
+                                   in totals.items() if ptype == 'pit'},
+                                  "pit")
+            bat_order = sorted(batters, key=lambda p: (-batters[p]['w_avg'],
+                                                       p))
+            retv[offset + 1] = ([(pkey, batters[pkey]) for pkey in bat_order],
+                                rank_pitchers(pitchers))
+    return retv
+
+if __name__ == "__main__":
+    import sys
+    rankings = rank_free_agents(datetime.strptime(sys.argv[1], "%Y-%m-%d"))
+    for wlen, (bats, pits) in rankings.items():
+        print(f"*** {wlen} days")
+        for bkey, binfo in bats[:10]:
+            print(bkey, binfo['name'], binfo['team'],
+                  format(binfo['w_avg'], '.3f'))
+        for pkey, pinfo in pits[:10]:
+            print(pkey, pinfo['name'], pinfo['team'],
+                  format(pinfo['w_era'], '.2f'),
+                  format(pinfo['w_whip'], '.3f'),
+                  format(pinfo['w_k9'], '.3f'))
@@ -0,0 +1,156 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+game_index -- one entry per MLB game on a date, keyed by game id
+(MLB_YYYYmmdd_AWAY@HOME, with _2 added for the second game of a
+doubleheader).  The scoreboard links each game several times; the index
+keeps one boxscore link per game along with the teams, doubleheader number
+and status read from the game's score card.  Indexes are saved as
+data/games_on_YYYYmmdd.json.  Once every game in a saved index is over
+(final, suspended or postponed) the scoreboard is not read again.
+"""
+import os
+import re
+import hashlib
+from page_fetch import get_page, ttl_for_date
+from page_parse import make_soup, make_strainer
+import data_store
+
+FINAL = "final"
+IN_PROGRESS = "in progress"
+POSTPONED = "postponed"
+SUSPENDED = "suspended"
+SCHEDULED = "scheduled"
+POSTPONED_WORDS = ["Postponed", "Canceled", "Cancelled"]
+START_TIME = re.compile(r"\b\d{1,2}:\d{2}\s*[AaPp][Mm]\b")
+PLAYED = [FINAL, IN_PROGRESS, SUSPENDED]
+OVER = [FINAL, POSTPONED, SUSPENDED]
+
+def index_file(game_date):
+    """
+    Get the file name of a date's game index
+
+    @param game_date datetime date of games
+    @return String data file name
+    """
+    return os.sep.join(["data",
+                        f"games_on_{game_date.strftime('%Y%m%d')}.json"])
+
+def parse_game_link(href):
+    """
+    Pick a game apart from its boxscore link
+
+    @param href String link found on the scoreboard page
+    @return dict with game_id, away, home and game_no (1, or 2 for the
+            second game of a doubleheader), or None if href is not a
+            boxscore link
+    """
+    if "boxscore/MLB_" not in href:
+        return None
+    game_id = href.split("?")[0].rstrip("/").split("/")[-1]
+    parts = game_id.split("_")
+    game_no = 1
+    if len(parts) > 3 and parts[-1].isdigit():
+        game_no = int(parts[-1])
+    teams = parts[2].split("@")
+    if len(teams) != 2:
+        return None
+    return {"game_id": game_id, "away": teams[0], "home": teams[1],
+            "game_no": game_no}
+
+def card_status(ctext):
+    """
+    Read a game's status from its score card text.  A suspended game was
+    played up to the suspension, so its boxscore counts for the date.  A
+    card showing a start time is a game that has not started.
+
+    @param ctext String score card text
+    @return String FINAL, SUSPENDED, POSTPONED, SCHEDULED or IN_PROGRESS
+    """
+    if "Suspended" in ctext:
+        return SUSPENDED
+    if any(word in ctext for word in POSTPONED_WORDS):
+        return POSTPONED
+    if "Final" in ctext:
+        return FINAL
+    if START_TIME.search(ctext):
+        return SCHEDULED
+    return IN_PROGRESS
+
+def is_score_card(cls):
+    """
+    Class filter that matches the score card divs of a scoreboard page
+
+    @param cls String class attribute of a div
+    @return boolean
+    """
+    return bool(cls) and "single-score-card" in cls
+
+def index_scoreboard(content):
+    """
+    Build the game index from the boxscore links in a scoreboard page's
+    score cards.  Only the score card divs are built when restricted
+    parsing is on.
+
+    @param content bytes scoreboard page
+    @return dict game id -> dict with link, away, home, game_no, status,
+            state (hash of the score card text) and text (score card
+            text), in scoreboard order
+    """
+    soup = make_soup(content, make_strainer("div", class_=is_score_card),
+                     "scoreboard")
+    retv = {}
+    for entry in soup.find_all("a", href=True):
+        game = parse_game_link(entry["href"])
+        if game is None or game["game_id"] in retv:
+            continue
+        card = entry.find_parent("div", class_=is_score_card)
+        if card is None:
+            continue
+        ctext = " ".join(card.get_text(" ").split())
+        game["link"] = entry["href"]
+        game["status"] = card_status(ctext)
+        game["state"] = hashlib.sha256(ctext.encode("utf-8")).hexdigest()
+        game["text"] = ctext
+        retv[game.pop("game_id")] = game
+    return retv
+
+def load_game_index(game_date, fresh=False):
+    """
+    Get the game index for a date, reading the scoreboard unless a saved
+    index shows that every game is over
+
+    @param game_date datetime date of games
+    @param fresh boolean always read (and revalidate) the scoreboard
+    @return dict returned by index_scoreboard
+    """
+    ifile = index_file(game_date)
+    if not fresh and data_store.exists(ifile):
+        games = data_store.load(ifile)
+        if games and all(game["status"] in OVER
+                         for game in games.values()):
+            return games
+    gday = game_date.strftime("%Y%m%d")
+    url = f"https://www.cbssports.com/mlb/scoreboard/{gday}/"
+    ttl = 0 if fresh else ttl_for_date(game_date)
+    games = index_scoreboard(get_page(url, ttl))
+    data_store.save(ifile, games)
+    return games
+
+def league_games(game_date, fresh=False, teams_file=None):
+    """
+    Get the index entries of games involving a league team
+
+    @param game_date datetime date of games
+    @param fresh boolean always read (and revalidate) the scoreboard
+    @param teams_file String json list of the team abbreviations wanted
+           (data/abbreviations.json if None)
+    @return dict game id -> index entry, in scoreboard order
+    """
+    if teams_file is None:
+        teams_file = os.sep.join(["data", "abbreviations.json"])
+    teamabbrv = data_store.load(teams_file)
+    return {game_id: game
+            for game_id, game in load_game_index(game_date, fresh).items()
+            if game["away"] in teamabbrv or game["home"] in teamabbrv}
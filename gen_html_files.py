@@ -7,81 +7,225 @@ in html<date> directory
 """
 import os
 import json
+import hashlib
+from functools import lru_cache
+from configparser import ConfigParser
+from concurrent.futures import ProcessPoolExecutor
 from find_unclaimed import get_free_agents
+from batch_stats import player_rates, format_rate
+import data_store
 
-def gen_html_files(date_info):
+BHEADERS = ["NAME", "TEAM", "POSITION", "AT BATS", "AVG", "RUNS",
+            "RBIS", "HR", "SB"]
+PHEADERS = ["NAME", "TEAM", "WIN", "SAVE", "INNINGS",
+            "ERA", "WHIP", "K/9"]
+MANIFEST = ".page_hashes.json"
+PAGE_SETTINGS = {}
+
+def page_files_wanted():
+    """
+    Check the pages setting in roto.ini: files (the default) writes the
+    html_files_<date> directories, server leaves the pages to roto_server
+
+    @return boolean True if html files are written
+    """
+    if "pages" not in PAGE_SETTINGS:
+        config = ConfigParser()
+        config.read('roto.ini')
+        PAGE_SETTINGS["pages"] = config["DEFAULT"].get("pages", "files")
+    return PAGE_SETTINGS["pages"] != "server"
+
+def gen_html_files(date_info, teams=None, workers=1, ldir="data",
+                   html_root=None):
     """
     Generate a directory for the date specified.  That directory will
     contain an html file for each roto team that contains that teams stats
-    for that day
+    for that day.  Pages whose input data has not changed since they were
+    last written are skipped.
 
     @param date_info datetime value
+    @param teams set of Rotisserie team names to regenerate (all if None)
+    @param workers int number of processes rendering pages (1 renders
+           in this process)
+    @param ldir String directory holding the league's data files
+    @param html_root String directory the html_files_<date> directory is
+           created in (the current directory if None)
     """
     tempv = date_info.strftime("%Y%m%d")
     ndate = date_info.strftime("%A - %B %d, %Y")
     dirname = f"html_files_{tempv}"
-    with open("tablehtml.txt", "r", encoding="utf8") as iofile:
-        tpattern = iofile.read()
+    if html_root:
+        dirname = os.sep.join([html_root, dirname])
     if not os.path.exists(dirname):
-        os.mkdir(dirname)
-    fileio = os.sep.join(["data", f"rteams_on_{tempv}.json"])
-    with open(fileio, "r", encoding="utf8") as iofile:
-        team_data = json.load(iofile)
-    fnames = []
-    txtvals = []
-    for tempv in team_data:
-        fnames.append(
-            tempv.replace(" ", "_").replace("&", "X").replace("'", "X")
-        )
-        txtvals.append(tempv.replace("&", "&amp;").replace("'", "&apos;"))
-    print(fnames)
-    print(txtvals)
-    bheaders = ["NAME", "TEAM", "POSITION", "AT BATS", "AVG", "RUNS",
-               "RBIS", "HR", "SB"]
-    pheaders = ["NAME", "TEAM", "WIN", "SAVE", "INNINGS",
-               "ERA", "WHIP", "K/9"]
-    for indx, tempv in enumerate(team_data):
-        ltables = []
-        ltables.append(get_new_table(team_data[tempv]["batters"],
-                               bheaders, bdata_func))
-        ltables.append(get_new_table(team_data[tempv]["pitchers"],
-                               pheaders, pdata_func))
-        otxt = tpattern[:] % (txtvals[indx], txtvals[indx], ndate,
-                              ltables[0], ltables[1])
-        do_io(otxt, dirname, fnames[indx])
-    handle_free_agents(bheaders, pheaders, ndate, tpattern, dirname)
-
-def handle_free_agents(bheaders, pheaders, ndate, tpattern, dirname):
-    """
-    Call get_free_agents and generate free agent files
-
-    @param bheaders list Headers for batter tables
-    @param pheaders list Headers for pitcher tables
-    @param ndata String date
-    @param tpattern String format string of entire html page
-    @param dirname String name of directory where this data will be stored
-    """
-    free_agents = get_free_agents()
-    bats = get_new_table(free_agents[0], bheaders, bdata_func)
-    otxt = tpattern[:] % ("Batters Available", "Batters Available", ndate,
-                         bats, "")
-    do_io(otxt, dirname, "free_agent_batters")
-    pits = get_new_table(free_agents[1], pheaders, pdata_func)
-    otxt = tpattern[:] % ("Pitchers Available", "Pitchers Available", ndate,
-                         pits, "")
-    do_io(otxt, dirname, "free_agent_pitchers")
-
-def do_io(otxt, dirname, file_nm):
-    """
-    Write html file in html_files_<date> directory
+        os.makedirs(dirname)
+    all_jobs = team_jobs(date_info, ldir)
+    print([job[0] for job in all_jobs.values()])
+    print([job[2][0] for job in all_jobs.values()])
+    jobs = [job for tname, job in all_jobs.items()
+            if teams is None or tname in teams]
+    jobs.extend(free_agent_jobs(ndate, date_info, ldir))
+    render_pages(jobs, dirname, workers)
+
+def team_jobs(date_info, ldir="data"):
+    """
+    Set up the team pages for a date
+
+    @param date_info datetime value
+    @param ldir String directory holding the league's data files
+    @return dict Rotisserie team name -> page job (see render_pages)
+    """
+    tempv = date_info.strftime("%Y%m%d")
+    ndate = date_info.strftime("%A - %B %d, %Y")
+    fileio = os.sep.join([ldir, f"rteams_on_{tempv}.json"])
+    team_data = data_store.load(fileio)
+    retv = {}
+    for rteam, tinfo in team_data.items():
+        fname = rteam.replace(" ", "_").replace("&", "X").replace("'", "X")
+        txtval = rteam.replace("&", "&amp;").replace("'", "&apos;")
+        retv[rteam] = (fname, team_page, (txtval, tinfo, ndate))
+    return retv
+
+def free_agent_jobs(ndate, date_info=None, ldir="data"):
+    """
+    Call get_free_agents and set up the free agent pages
+
+    @param ndate String date
+    @param date_info datetime day being displayed (yesterday if None)
+    @param ldir String directory holding the league's data files
+    @return list of page jobs (see render_pages)
+    """
+    free_agents = get_free_agents(date_info, ldir)
+    return [("free_agent_batters", free_agent_page,
+             ("Batters Available", free_agents[0], "bat", ndate)),
+            ("free_agent_pitchers", free_agent_page,
+             ("Pitchers Available", free_agents[1], "pit", ndate))]
+
+@lru_cache(maxsize=None)
+def compile_template(tfile="tablehtml.txt"):
+    """
+    Read the page template once and split it at its %s fields
+
+    @param tfile String template file name
+    @return tuple of String template pieces around the fields
+    """
+    with open(tfile, "r", encoding="utf8") as iofile:
+        tpattern = iofile.read()
+    return tuple(part.replace("%%", "%") for part in tpattern.split("%s"))
+
+def fill_template(values):
+    """
+    Fill in the compiled page template
+
+    @param values list of Strings, one for each field in the template
+    @return String html page
+    """
+    parts = compile_template()
+    pieces = [parts[0]]
+    for value, part in zip(values, parts[1:]):
+        pieces.append(value)
+        pieces.append(part)
+    return "".join(pieces)
+
+def team_page(txtval, tinfo, ndate):
+    """
+    Render the page for one Rotisserie team
+
+    @param txtval String team name (html escaped)
+    @param tinfo dict team data from the rteams_on_*.json file
+    @param ndate String date
+    @return String html page
+    """
+    return fill_template([txtval, txtval, ndate,
+                          get_new_table(tinfo["batters"], BHEADERS,
+                                        bdata_func),
+                          get_new_table(tinfo["pitchers"], PHEADERS,
+                                        pdata_func)])
+
+def free_agent_page(title, players, ptype, ndate):
+    """
+    Render a free agent page
+
+    @param title String page title
+    @param players dict free agents (from get_free_agents)
+    @param ptype String bat or pit
+    @param ndate String date
+    @return String html page
+    """
+    if ptype == "bat":
+        table = get_new_table(players, BHEADERS, bdata_func)
+    else:
+        table = get_new_table(players, PHEADERS, pdata_func)
+    return fill_template([title, title, ndate, table, ""])
+
+def page_hash(job):
+    """
+    Hash everything a page is rendered from
+
+    @param job tuple (file name, render function, arguments)
+    @return String hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(job[1].__name__.encode("utf-8"))
+    digest.update(json.dumps(job[2], sort_keys=True).encode("utf-8"))
+    digest.update("%s".join(compile_template()).encode("utf-8"))
+    return digest.hexdigest()
+
+def render_job(job):
+    """
+    Render one page (worker for render_pages)
+
+    @param job tuple (file name, render function, arguments)
+    @return String html page
+    """
+    return job[1](*job[2])
+
+def render_pages(jobs, dirname, workers=1):
+    """
+    Render and write pages whose inputs changed since the last time they
+    were written.  The hashes of the inputs are kept in a manifest file in
+    dirname.
+
+    @param jobs list of tuples (file name, render function, arguments)
+    @param dirname String directory where the pages are stored
+    @param workers int number of rendering processes
+    """
+    mfile = os.sep.join([dirname, MANIFEST])
+    manifest = {}
+    if os.path.exists(mfile):
+        with open(mfile, "r", encoding="utf8") as iofile:
+            manifest = json.load(iofile)
+    todo = []
+    for job in jobs:
+        jhash = page_hash(job)
+        if manifest.get(job[0]) == jhash and os.path.exists(
+                os.sep.join([dirname, f"{job[0]}.html"])):
+            continue
+        todo.append((job, jhash))
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pages = list(pool.map(render_job, [job for job, _ in todo]))
+    else:
+        pages = [render_job(job) for job, _ in todo]
+    for (job, jhash), otxt in zip(todo, pages):
+        do_io(otxt, dirname, job[0])
+        manifest[job[0]] = jhash
+    if todo:
+        do_io(json.dumps(manifest, indent=4), dirname, MANIFEST, "")
+
+def do_io(otxt, dirname, file_nm, ext=".html"):
+    """
+    Write html file in html_files_<date> directory.  The file is replaced
+    in one step so readers never see a partly written page.
 
     @param otxt String html text to be written
     @param dirname String directory where html text will be stored
     @param file_nm String file name where html text will be stored
+    @param ext String file name extension
     """
-    fileio = os.sep.join([dirname, f"{file_nm}.html"])
-    with open(fileio, "w", encoding="utf8") as iofile:
+    fileio = os.sep.join([dirname, f"{file_nm}{ext}"])
+    with open(fileio + ".tmp", "w", encoding="utf8") as iofile:
         iofile.write(otxt)
+    os.replace(fileio + ".tmp", fileio)
 
 def init_table_header(headers):
     """
@@ -98,34 +242,38 @@ def init_table_header(headers):
     wheader = wrapper(header, "tr")
     return [wheader]
 
-def bdata_func(tlines, day_stats):
+def bdata_func(tlines, day_stats, rates=None):
     """
     Function to add batting statistics for one player to the html table
 
     @param tlines html file so far.  We add stats to this
     @param day_stats dict of statistics for a player
+    @param rates dict rate stats for this player from
+           batch_stats.player_rates (computed here if None)
     """
     if 'save' in day_stats:
         return tlines
+    if rates is None:
+        rates = player_rates({0: day_stats}, "bat")[0]
     tlines.append(wrapper(str(day_stats['ab']), 'td'))
-    atbs =  day_stats['ab']
-    if atbs == 0:
-        atbs = 1
-    bavg = day_stats['hits'] / atbs
-    tlines.append(wrapper(format(round(bavg, 3), '.3f').lstrip('0'), 'td'))
+    tlines.append(wrapper(format_rate(rates['avg'], 3, True), 'td'))
     tlines.append(wrapper(str(day_stats['runs']), 'td'))
     tlines.append(wrapper(str(day_stats['rbis']), 'td'))
     tlines.append(wrapper(str(day_stats['hr']), 'td'))
     tlines.append(wrapper(str(day_stats['sb']), 'td'))
     return tlines
 
-def pdata_func(tlines, day_stats):
+def pdata_func(tlines, day_stats, rates=None):
     """
     Function to add pitching statistics for one player to the html table
 
     @param tlines html file so far.  We add stats to this
     @param day_stats dict of statistics for a player
+    @param rates dict rate stats for this player from
+           batch_stats.player_rates (computed here if None)
     """
+    if rates is None:
+        rates = player_rates({0: day_stats}, "pit")[0]
     tlines.append(wrapper(str(day_stats['win']), 'td'))
     tlines.append(wrapper(str(day_stats['save']), 'td'))
     outs = day_stats['outs']
@@ -136,46 +284,40 @@ def pdata_func(tlines, day_stats):
     else:
         inpit = str(full_inn) + " " + str(part_inn) + "/3"
     tlines.append(wrapper(inpit, 'td'))
-    eruns = day_stats['earned_runs']
-    era = 27 * eruns / outs
-    erastr = format(round(era, 2), '.2f')
-    tlines.append(wrapper(erastr, 'td'))
-    wlkhts = day_stats['walks'] + day_stats['hits']
-    whip = 3 * wlkhts / outs
-    whipstr = format(round(whip, 3), '.3f')
-    tlines.append(wrapper(whipstr, 'td'))
-    kstr = 27 * day_stats['strikeouts'] / outs
-    kstro = format(round(kstr, 3), '.3f')
-    tlines.append(wrapper(kstro, 'td'))
+    tlines.append(wrapper(format_rate(rates['era'], 2), 'td'))
+    tlines.append(wrapper(format_rate(rates['whip'], 3), 'td'))
+    tlines.append(wrapper(format_rate(rates['k9'], 3), 'td'))
     return tlines
 
 def get_new_table(players, headers, data_func):
     """
-    Generate a table for the roto team display
+    Generate a table for the roto team display.  All pieces of the table
+    are collected in one list and joined once.
 
     @param players dict of players indexed by Cbs player number
     @param headers list of column headings for the table
     @param data_func stat extraction function (different for batters and
                                                pitchers)
     """
-    ttable = init_table_header(headers)
+    pieces = ['<table border="1">']
+    pieces.extend(init_table_header(headers))
+    rates = player_rates({number: players[number]['day_stats']
+                          for number in players
+                          if players[number]['day_stats']})
     for number in players:
-        tlines = []
         indata = players[number]
-        tlines.append(wrapper(indata['name'], 'td align="left"'))
-        tlines.append(wrapper(indata['team'], 'td'))
+        tlines = ["\n<tr>", '<td align="left">', indata['name'], "</td>",
+                  "<td>", indata['team'], "</td>"]
         if not indata['position'] == 'P':
-            tlines.append(wrapper(indata['position'], 'td'))
+            tlines.extend(["<td>", indata['position'], "</td>"])
         if indata['day_stats']:
-            tlines = data_func(tlines, indata['day_stats'])
+            tlines = data_func(tlines, indata['day_stats'], rates[number])
         else:
-            for _  in range(6):
-                tlines.append(wrapper('-', 'td'))
-        dline = "".join(tlines)
-        dline = wrapper(dline, "tr")
-        ttable.append(dline)
-    records = "\n".join(ttable)
-    return wrapper(records, 'table border="1"')
+            tlines.extend(["<td>-</td>"] * 6)
+        tlines.append("</tr>")
+        pieces.extend(tlines)
+    pieces.append("</table>")
+    return "".join(pieces)
 
 def wrapper(data, wrap):
     """
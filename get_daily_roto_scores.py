@@ -5,26 +5,29 @@
 get_daily_roto_scores --  Get scores for roto teams on this day.
 """
 import os
-import json
 from get_roto_teams import get_weekly_league_file
+import data_store
 
-def get_daily_roto_scores(rday):
+def get_daily_roto_scores(rday, rleague=None, ldir="data"):
     """
     Create an rteams_on_<date>.json file which contains links to a players
     stats for that day
 
     @param rday datetime day we are getting the scores for
+    @param rleague dict league rosters already read from the league-*.json
+           file for this period (read here if None).  Gets modified.
+    @param ldir String directory holding the league's data files (stats
+           are always read from the shared data directory)
     """
-    lfile = get_weekly_league_file(rday)
+    lfile = get_weekly_league_file(rday, ldir)
     txt_rday = rday.strftime("%Y%m%d")
-    update_file = os.sep.join(["data", f"rteams_on_{txt_rday}.json"])
-    if os.path.exists(update_file):
+    update_file = os.sep.join([ldir, f"rteams_on_{txt_rday}.json"])
+    if data_store.exists(update_file):
         return
-    with open(lfile, "r", encoding="utf8") as ofile:
-        rleague = json.load(ofile)
+    if rleague is None:
+        rleague = data_store.load(lfile)
     day_data = os.sep.join(["data", f"stats_on_{txt_rday}.json"])
-    with open(day_data, "r", encoding="utf8") as ofile:
-        precords = json.load(ofile)
+    precords = data_store.load(day_data)
     for rteam in rleague:
         for ptype in ['batters', 'pitchers']:
             for pkey in rleague[rteam][ptype]:
@@ -32,5 +35,4 @@ def get_daily_roto_scores(rday):
                     rleague[rteam][ptype][pkey]['day_stats'] = precords[pkey]
                 else:
                     rleague[rteam][ptype][pkey]['day_stats'] = ""
-    with open(update_file, "w", encoding="utf8") as ufile:
-        json.dump(rleague, ufile, indent=4)
+    data_store.save(update_file, rleague)
@@ -2,13 +2,24 @@
 # Rotisserie league code
 # This code is licensed under the MIT license (see LICENSE.txt for details)
 """
-Collect the statistics for all players on a given date.
+Collect the statistics for all players on a given date.  The stats come
+from a stats source named in STATS_SOURCES: cbs (the default) scrapes the
+boxscore pages, dump reads a local game log dump (see stat_dump).  Set
+stats_source in roto.ini to change the default.
 """
 import os
-import json
 from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
+from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+from page_fetch import get_page, ttl_for_date, cached_digest, NEVER_EXPIRES
+from page_parse import get_tables, get_text_soup
+from game_index import league_games, index_file, FINAL, PLAYED
+from player_registry import build_name_index, resolve_name, register_players
+import data_store
+import metrics
+
+FETCH_WORKERS = 8
+SOURCE_SETTINGS = {}
 
 def get_players_on(txt_date):
     """
@@ -16,58 +27,182 @@ def get_players_on(txt_date):
     """
     return get_players_on_date(datetime.strptime(txt_date, "%Y-%m-%d"))
 
-def get_games_on_date(game_date):
+def get_games_on_date(game_date, teams_file=None):
     """
-    Collect links to boxscores for games played on game_date
+    Collect links to boxscores for games played on game_date (one link per
+    league game, postponed games and games not started left out)
+
+    @param game_date datetime date of games
+    @param teams_file String json list of the team abbreviations wanted
+           (data/abbreviations.json if None)
     """
-    with open(os.sep.join(["data", "abbreviations.json"]), "r",
-                       encoding="utf8") as afile:
-        teamabbrv = json.load(afile)
-    gday = game_date.strftime("%Y%m%d")
-    url = f"https://www.cbssports.com/mlb/scoreboard/{gday}/"
-    soup = BeautifulSoup(requests.get(url).content, "html.parser")
-    glist = soup.find_all("a", href=True)
-    retv = []
-    for entry in glist:
-        if "boxscore/MLB_" in entry["href"]:
-            mlb_teams = entry["href"].split("_")[-1]
-            if mlb_teams.startswith("2"):
-                mlb_teams = entry["href"].split("_")[-2]
-            mlb_teams = mlb_teams.strip("_/").split("@")
-            if mlb_teams[0] in teamabbrv or mlb_teams[1] in teamabbrv:
-                retv.append(entry["href"])
-    return retv
+    return [game["link"] for game in
+            league_games(game_date, teams_file=teams_file).values()
+            if game["status"] in PLAYED]
+
+def get_stats_source():
+    """
+    Get the default stats source named in roto.ini
+
+    @return String key of STATS_SOURCES
+    """
+    if "source" not in SOURCE_SETTINGS:
+        config = ConfigParser()
+        config.read('roto.ini')
+        SOURCE_SETTINGS["source"] = config["DEFAULT"].get("stats_source",
+                                                          "cbs")
+    return SOURCE_SETTINGS["source"]
 
-def get_players_on_date(game_date):
+def get_players_on_date(game_date, workers=FETCH_WORKERS, source=None,
+                        teams_file=None):
     """
     Collect the statistics for all players and save that data in a json file
+
+    @param game_date datetime date of games
+    @param workers int number of boxscores fetched at the same time
+    @param source String key of STATS_SOURCES (roto.ini setting if None)
+    @param teams_file String json list of the team abbreviations whose
+           games are collected (data/abbreviations.json if None)
     """
-    games_played = get_games_on_date(game_date)
-    indx = games_played[0].split("_")[1]
+    indx = game_date.strftime("%Y%m%d")
     ofilen = os.sep.join(["data", f"stats_on_{indx}.json"])
-    if os.path.exists(ofilen):
+    if data_store.exists(ofilen):
+        return
+    stats_on_this_date = STATS_SOURCES[source or get_stats_source()](
+        game_date, workers, teams_file)
+    register_players(stats_on_this_date)
+    data_store.save(ofilen, stats_on_this_date)
+
+def boxscore_stats(game_date, workers=FETCH_WORKERS, teams_file=None):
+    """
+    Stats source that scrapes the boxscore of every league game
+
+    @param game_date datetime date of games
+    @param workers int number of boxscores fetched at the same time
+    @param teams_file String json list of the team abbreviations whose
+           games are collected (data/abbreviations.json if None)
+    @return dict indexed by Cbssports player number of this days stats
+    """
+    games_played = [(game["link"], game["status"] == FINAL)
+                    for game in league_games(
+                        game_date, teams_file=teams_file).values()
+                    if game["status"] in PLAYED]
+    retv = {}
+    for records in fetch_boxscores(games_played, workers):
+        retv.update(records)
+    return retv
+
+def dump_stats(game_date, workers=FETCH_WORKERS,  # pylint: disable=W0613
+               teams_file=None):
+    """
+    Stats source that reads the local game log dump named in roto.ini
+
+    @param game_date datetime date of games
+    @param workers int unused (the dump is read in one pass)
+    @param teams_file String unused (the dump holds every team)
+    @return dict indexed by Cbssports player number of this days stats
+    """
+    import stat_dump  # pylint: disable=import-outside-toplevel
+    return stat_dump.day_records(game_date)
+
+def saved_boxscore_links(game_date, teams_file=None):
+    """
+    List the boxscore links of the league games played in a date's saved
+    game index (the scoreboard is not read)
+
+    @param game_date datetime date of games
+    @param teams_file String json list of the team abbreviations wanted
+           (data/abbreviations.json if None)
+    @return list of boxscore links (empty if there is no saved index)
+    """
+    if teams_file is None:
+        teams_file = os.sep.join(["data", "abbreviations.json"])
+    ifile = index_file(game_date)
+    if not (data_store.exists(ifile) and data_store.exists(teams_file)):
+        return []
+    teamabbrv = data_store.load(teams_file)
+    return [game["link"] for game in data_store.load(ifile).values()
+            if game["status"] in PLAYED and (game["away"] in teamabbrv or
+                                             game["home"] in teamabbrv)]
+
+def boxscore_digests(game_date, teams_file=None):
+    """
+    Hash the cached boxscore pages of the league games in a date's saved
+    game index
+
+    @param game_date datetime date of games
+    @param teams_file String json list of the team abbreviations wanted
+           (data/abbreviations.json if None)
+    @return dict boxscore link -> hash of the cached page (None if not
+            cached)
+    """
+    return {link: cached_digest("https://www.cbssports.com" + link)
+            for link in saved_boxscore_links(game_date, teams_file)}
+
+def revalidate_boxscores(game_date, workers=FETCH_WORKERS, teams_file=None):
+    """
+    Revalidate the cached boxscore pages of the league games in a date's
+    saved game index with conditional requests, so that a boxscore
+    corrected after the game ended replaces the cached copy.  Nothing is
+    read when the stats come from a dump.
+
+    @param game_date datetime date of games
+    @param workers int number of boxscores checked at the same time
+    @param teams_file String json list of the team abbreviations wanted
+           (data/abbreviations.json if None)
+    """
+    if get_stats_source() != "cbs":
         return
-    stats_on_this_date = {}
-    for boxscore in games_played:
-        print(boxscore)
-        raw_data = extract_raw_data(boxscore)
-        records = process_raw_data(raw_data)
-        stats_on_this_date.update(records)
-    with open(ofilen, "w", encoding="utf8") as ofile:
-        json.dump(stats_on_this_date, ofile, indent=4)
+    urls = ["https://www.cbssports.com" + link
+            for link in saved_boxscore_links(game_date, teams_file)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(lambda url: get_page(url, 0), urls))
+
+def fetch_boxscores(games_played, workers=FETCH_WORKERS):
+    """
+    Fetch and parse boxscores concurrently.  Results are yielded in the
+    order of games_played so that merging them is deterministic, and each
+    game's link is printed from this (the calling) thread as it is
+    yielded.
+
+    @param games_played list of (boxscore link, boolean game is final)
+    @param workers int maximum number of boxscores in flight
+    @return generator of dicts returned by process_raw_data
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for game, raw_data in zip(games_played,
+                                  pool.map(fetch_one_boxscore,
+                                           games_played)):
+            print(game[0])
+            yield process_raw_data(raw_data)
 
-def extract_raw_data(boxscore):
+def fetch_one_boxscore(game):
+    """
+    Worker used by fetch_boxscores
+
+    @param game tuple (String link to box score page, boolean final)
+    @return raw_data for this boxscore
+    """
+    return extract_raw_data(game[0], final=game[1])
+
+def extract_raw_data(boxscore, fresh=False, final=False):
     """
     Scrape data from website for boxscore specified
 
     @param boxscore String link to box score page
+    @param fresh boolean revalidate any cached copy of the page
+    @param final boolean the game is over (a cached copy fetched after
+           the game ended never expires)
     @returns extracted data, referred to as raw_data in the rest of this
              module
     """
     boxpage = "https://www.cbssports.com" + boxscore
-    txt = requests.get(boxpage).content
-    soup = BeautifulSoup(txt, "html.parser")
-    bs_tables = soup.find_all("table")
+    game_date = datetime.strptime(boxscore.split("_")[1], "%Y%m%d")
+    ttl = 0 if fresh else ttl_for_date(game_date)
+    if final and not fresh:
+        ttl = NEVER_EXPIRES
+    txt = get_page(boxpage, ttl)
+    bs_tables, encoding = get_tables(txt, "boxscore")
     retv = []
     for cnt, tbl in enumerate(bs_tables):
         if cnt > 7:
@@ -84,7 +219,8 @@ def extract_raw_data(boxscore):
                 for field in data:
                     orec.append(field.get_text())
                 retv.append(orec)
-    retv.append(parse_sb_info(soup))
+    retv.append(parse_sb_info(get_text_soup(txt, "BASERUNNING", encoding,
+                                            "boxscore")))
     return retv
 
 def parse_sb_info(soup):
@@ -109,25 +245,38 @@ def parse_sb_info(soup):
 
 def update_stolen_bases(plyr_data, sbinfo):
     """
-    Update stolen base information
+    Update stolen base information.  Each BASERUNNING line lists players
+    on one team, so a name found on both teams is credited to the team of
+    the line's other names.  Names that stay ambiguous are counted in the
+    ambiguous_names metrics and not credited.
 
     @param plyr_data dict of player information
     @param sbinfo stolen base information extracted from box scores
     @return plyr_data with stolen base stats adjusted
     """
+    name_index = build_name_index(plyr_data)
+    teams = sorted({team for team, _ in name_index})
     for entry in sbinfo:
-        new_data = entry[3:].split(", ")
-        for plyr in new_data:
+        steals = []
+        for plyr in entry[3:].split(", "):
             aplyr = plyr.split("(")[0].strip()
             parts = aplyr.split(" ")
             count = 1
             if parts[-1].isnumeric():
                 count = int(parts[-1])
                 aplyr = " ".join(parts[0:-1])
-            for entry2 in plyr_data:
-                if plyr_data[entry2]['name'] == aplyr:
-                    plyr_data[entry2]['sb'] = count
-                    break
+            steals.append((aplyr, count,
+                           resolve_name(name_index, plyr_data, aplyr, teams)))
+        line_teams = {plyr_data[cands[0]]['team'] for _, _, cands in steals
+                      if len(cands) == 1}
+        for aplyr, count, cands in steals:
+            if len(cands) > 1 and len(line_teams) == 1:
+                cands = [pkey for pkey in cands
+                         if plyr_data[pkey]['team'] in line_teams]
+            if len(cands) == 1:
+                plyr_data[cands[0]]['sb'] = count
+            elif cands:
+                metrics.add_count("ambiguous_names", aplyr)
     return plyr_data
 
 def process_raw_data(raw_data):
@@ -221,5 +370,7 @@ def remove_dash(pname):
         return pname
     return " ".join(parts[1:])
 
+STATS_SOURCES = {"cbs": boxscore_stats, "dump": dump_stats}
+
 if __name__ == "__main__":
     get_players_on("2022-04-14")
@@ -4,49 +4,76 @@
 """
 get_league_team_data creates a json file of all team lineups for the
 current period.  File name is league-YYYY-MM-DD.json where the date is
-the first day in the period.
+the first day in the period.  Selenium, requests and Beautiful Soup are
+imported by the functions that use them so that modules only needing
+get_weekly_league_file load quickly.
 """
 import os
+import copy
 import json
+import time
 from datetime import datetime, timedelta
 from configparser import ConfigParser
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-import chromedriver_autoinstaller
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from page_parse import make_soup, make_strainer
+from http_policy import fetch, POLICY
+from roster_history import latest_rosters, load_history, page_hash
+from roster_history import record_period, HISTORY_FILE
+import data_store
+import metrics
 
-def get_league_team_data(when_to_get):
+ROSTER_WORKERS = 6
+COOKIE_FILE = os.sep.join(["data", "cbs_cookies.json"])
+
+def get_league_team_data(when_to_get, section="DEFAULT", ldir="data"):
     """
     Extract the username, password, and league name from the ini.file
-    Use username/password combination and league name to create a driver.
+    Try the session cookies saved by an earlier login first.  If there are
+    none, or the site rejects them, use the username/password combination
+    to log in with a driver (headless if the ini file says headless = yes)
+    and save the new cookies.
     Calls get_all_teams to get the team information.
     Saves the results in a json file whose name is derived from the starting
     date of this scoring period.
+
+    @param when_to_get datetime day in the period
+    @param section String roto.ini section describing the league
+    @param ldir String directory holding this league's data files
     """
-    ofilen = get_weekly_league_file(when_to_get)
-    if os.path.exists(ofilen):
+    ofilen = get_weekly_league_file(when_to_get, ldir)
+    if data_store.exists(ofilen):
         return
     config = ConfigParser()
     config.read('roto.ini')
-    parse_info = config["DEFAULT"]
+    parse_info = config[section]
     league = parse_info["league"]
-    driver = cbs_login(parse_info["username"],
-                       parse_info["password"])
-    team_data = get_all_teams(driver, league)
-    with open(ofilen, "w", encoding="utf8") as data_file:
-        json.dump(team_data, data_file, indent=4)
-    driver.quit()
+    team_data = None
+    hfile = os.sep.join([ldir, os.path.basename(HISTORY_FILE)])
+    cfile = os.sep.join([ldir, os.path.basename(COOKIE_FILE)])
+    known = latest_rosters(load_history(hfile), when_to_get)
+    known["new_hashes"] = {}
+    session = load_session(cfile)
+    if session:
+        team_data = get_all_teams(session, league, known=known)
+    if team_data is None:
+        driver = cbs_login(parse_info["username"],
+                           parse_info["password"],
+                           parse_info.getboolean("headless", False))
+        save_cookies(driver, cfile)
+        team_data = get_all_teams(session_from_driver(driver), league,
+                                  driver=driver, known=known)
+        driver.quit()
+    data_store.save(ofilen, team_data)
+    period = os.path.basename(ofilen)[len("league-"):-len(".json")]
+    record_period(period, team_data, known["new_hashes"], hfile)
 
-def get_weekly_league_file(cdate):
+def get_weekly_league_file(cdate, ldir="data"):
     """
     Get league rosters
 
     @param cdate date we are interested in.  Get appropriate league file for
            that week.
+    @param ldir String directory holding the league's data files
     @return String name of file containing rosters for the specified week.
     """
     ddiff = cdate.weekday() - 2
@@ -54,12 +81,13 @@ def get_weekly_league_file(cdate):
         ddiff += 7
     newd = cdate - timedelta(days=ddiff)
     sdate = newd.strftime("%Y-%m-%d")
-    ofilen = os.sep.join(["data", f"league-{sdate}.json"])
+    ofilen = os.sep.join([ldir, f"league-{sdate}.json"])
     return ofilen
 
 def wait_get(wtime, driver, locator):
     """
-    Wait while selenium displays stuff
+    Wait while selenium displays stuff.  The wait is repeated up to
+    http_policy.POLICY["retries"] more times before giving up.
 
     @param wtime integer seconds until timeout if object is not present
     @param driver object Selenium driver
@@ -67,25 +95,41 @@ def wait_get(wtime, driver, locator):
 
     @return object Webelement that we are waiting for
     """
-    try:
-        _ = WebDriverWait(driver, wtime).until(
-            EC.presence_of_element_located(locator)
-        )
-    except TimeoutException:
-        print("Aaargh!! Bad News!!")
-    return driver.find_element(locator[0], locator[1])
+    # pylint: disable=import-outside-toplevel
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+    for _ in range(POLICY["retries"] + 1):
+        try:
+            with metrics.timed("selenium_wait", locator[1]):
+                return WebDriverWait(driver, wtime).until(
+                    EC.presence_of_element_located(locator)
+                )
+        except TimeoutException:
+            continue
+    raise TimeoutError(f"{locator[1]} not found after "
+                       f"{wtime * (POLICY['retries'] + 1)} seconds")
 
-def cbs_login(usern, passw):
+def cbs_login(usern, passw, headless=False):
     """
     Login in the the Cbs site
 
     @param usern String my user name
     @param passw String corresponding password
+    @param headless boolean run Chrome without a window
     @return Selenium driver after login
     """
+    # pylint: disable=import-outside-toplevel
+    import chromedriver_autoinstaller
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.service import Service
     chromedriver_autoinstaller.install()
     options = webdriver.ChromeOptions()
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
     driver = webdriver.Chrome(service=Service(), options=options)
     driver.get('https://www.cbssports.com/user/login/' +
                '?redirectUrl=https%3A%2F%2Fwww.cbssports.com%2F')
@@ -95,26 +139,128 @@ def cbs_login(usern, passw):
     password.send_keys(passw)
     button = wait_get(15, driver, (By.CLASS_NAME, "BasicButton"))
     button.click()
+    wait_get(15, driver, (By.TAG_NAME, "body"))
     return driver
 
-def get_all_teams(driver, league):
+def save_cookies(driver, cookie_file=COOKIE_FILE):
     """
-    Loop through all teams in the league and extract the player data
+    Save the cookies of a logged in driver so later runs can skip the login
 
-    @param driver Selenium driver
-    @param league league name (supplied by Cbssports and stashed in ini file)
-    @return dict rosters indexed by team name
+    @param driver Selenium driver after cbs_login
+    @param cookie_file String file the cookies are saved in
+    """
+    cookies = {"user_agent": driver.execute_script(
+                   "return navigator.userAgent"),
+               "cookies": driver.get_cookies()}
+    fdesc = os.open(cookie_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                    0o600)
+    with os.fdopen(fdesc, "w", encoding="utf8") as cfile:
+        json.dump(cookies, cfile, indent=4)
+
+def load_session(cookie_file=COOKIE_FILE):
     """
-    driver.get(f"https://{league}.cbssports.com/standings/overall")
-    wpage = driver.page_source.encode("utf-8")
-    soup = BeautifulSoup(wpage, "html.parser")
+    Build an http session from the saved cookies that have not expired.
+    Short lived cookies (analytics and the like) expiring does not throw
+    the session away; if the login itself is no longer accepted,
+    get_all_teams finds no teams and the caller logs in again.
+
+    @param cookie_file String file the cookies were saved in
+    @return requests.Session object, or None if there are no saved cookies
+            or all of them have expired
+    """
+    if not os.path.exists(cookie_file):
+        return None
+    with open(cookie_file, "r", encoding="utf8") as cfile:
+        cookies = json.load(cfile)
+    now = time.time()
+    live = [cookie for cookie in cookies["cookies"]
+            if "expiry" not in cookie or cookie["expiry"] >= now]
+    if not live:
+        return None
+    return make_session(cookies["user_agent"], live)
+
+def make_session(user_agent, cookies):
+    """
+    Create an http session carrying browser cookies
+
+    @param user_agent String browser user agent
+    @param cookies list of cookie dicts in Selenium format
+    @return requests.Session object
+    """
+    import requests  # pylint: disable=import-outside-toplevel
+    session = requests.Session()
+    session.hooks["response"].append(metrics.count_response)
+    session.headers["User-Agent"] = user_agent
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"],
+                            domain=cookie.get("domain"),
+                            path=cookie.get("path", "/"))
+    return session
+
+def session_from_driver(driver):
+    """
+    Copy the cookies of a logged in Selenium driver into an http session
+
+    @param driver Selenium driver after cbs_login
+    @return requests.Session object that is logged in to the Cbs site
+    """
+    return make_session(driver.execute_script("return navigator.userAgent"),
+                        driver.get_cookies())
+
+def get_team_links(wpage):
+    """
+    Find the links to the team pages on the standings page
+
+    @param wpage bytes standings page text
+    @return list of <a> tags linking to team pages
+    """
+    soup = make_soup(wpage, make_strainer("a", href=True), "standings")
     tm_info = soup.find_all("a", href=True)
-    all_rosters = {}
+    teams = []
     for tagv in tm_info:
         if 'href' in tagv.attrs:
             if tagv.attrs['href'].startswith('/teams/'):
-                keyv, pinfo = get_indv_team(driver, league, tagv)
-                all_rosters[keyv] = pinfo
+                teams.append(tagv)
+    return teams
+
+def get_all_teams(session, league, workers=ROSTER_WORKERS, driver=None,
+                  known=None):
+    """
+    Loop through all teams in the league and extract the player data.
+    Team pages are fetched and parsed concurrently over a logged in http
+    session.  If a driver is given, pages that do not come back with a
+    roster are read with the driver instead.
+
+    @param session requests.Session object that is logged in
+    @param league league name (supplied by Cbssports and stashed in ini file)
+    @param workers int number of team pages fetched at the same time
+    @param driver Selenium driver (optional)
+    @param known dict from roster_history.latest_rosters.  Teams whose
+           roster rows hash the same as last time reuse the old roster.
+           The new hashes are saved in known["new_hashes"].
+    @return dict rosters indexed by team name, or None if the session was
+            rejected and there is no driver to fall back on
+    """
+    standings = f"https://{league}.cbssports.com/standings/overall"
+    teams = get_team_links(fetch(session, standings).content)
+    if not teams:
+        if driver is None:
+            return None
+        driver.get(standings)
+        teams = get_team_links(driver.page_source.encode("utf-8"))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(
+            lambda tagv: get_session_team(session, league, tagv, known),
+            teams))
+    all_rosters = {}
+    for tagv, (keyv, pinfo, phash) in zip(teams, results):
+        if pinfo is None:
+            if driver is None:
+                return None
+            keyv, pinfo = get_indv_team(driver, league, tagv)
+        elif known is not None:
+            known.setdefault("new_hashes", {})[keyv] = phash
+        all_rosters[keyv] = pinfo
     return all_rosters
 
 def parse_players(pinfo, ret_team):
@@ -171,16 +317,53 @@ def get_indv_team(driver, league, team):
                                     player information
     """
     tlink = team.attrs['href']
-    tname = team.get_text()
-    ret_team = {'batters': {}, 'pitchers': {}, 'reserves': {}}
-    ret_team['team_name'] = tname
     driver.get(f"https://{league}.cbssports.com{tlink}")
     tpage = driver.page_source.encode("utf-8")
-    soup = BeautifulSoup(tpage, "html.parser")
+    return team.get_text(), parse_team_page(tpage, team.get_text())[0]
+
+def get_session_team(session, league, team, known=None):
+    """
+    Extract roster information for a team using an http session
+
+    @param session requests.Session object (from session_from_driver)
+    @param league String league name (returned from CBS)
+    @param team String name of this team
+    @param known dict from roster_history.latest_rosters (optional)
+    @return tname, ret_team, phash like get_indv_team plus the hash of
+            the roster rows.  ret_team is None if the page did not contain
+            any players.
+    """
+    tlink = team.attrs['href']
+    tpage = fetch(session, f"https://{league}.cbssports.com{tlink}").content
+    ret_team, phash = parse_team_page(tpage, team.get_text(), known)
+    if not any(ret_team[rkey] for rkey in ['batters', 'pitchers',
+                                           'reserves']):
+        ret_team = None
+    return team.get_text(), ret_team, phash
+
+def parse_team_page(tpage, tname, known=None):
+    """
+    Parse a team page.  If the roster rows hash the same as the last time
+    this team was scraped, the previous roster is reused.
+
+    @param tpage bytes page text
+    @param tname String name of this team
+    @param known dict from roster_history.latest_rosters (optional)
+    @return tuple (dict containing player information, String hash of the
+            roster rows)
+    """
+    soup = make_soup(tpage, make_strainer("tr", class_="playerRow"),
+                     "roster")
     pinfo = soup.find_all("tr", class_="playerRow")
+    phash = page_hash(pinfo)
+    if known and tname in known["rosters"]:
+        if known["hashes"].get(tname) == phash:
+            print("*** ", tname, "(unchanged)")
+            return copy.deepcopy(known["rosters"][tname]), phash
+    ret_team = {'batters': {}, 'pitchers': {}, 'reserves': {}}
+    ret_team['team_name'] = tname
     print("*** ", tname)
-    ret_team = parse_players(pinfo, ret_team)
-    return tname, ret_team
+    return parse_players(pinfo, ret_team), phash
 
 if __name__ == "__main__":
     get_league_team_data(datetime.now())
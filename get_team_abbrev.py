@@ -5,32 +5,42 @@
 get_teams_list -- writes data/abbreviations.json file
 """
 import os
-import json
-import requests
-from bs4 import BeautifulSoup
+from page_fetch import get_page
+from page_parse import make_soup, make_strainer
+import data_store
 
-def get_teams_list():
+TEAMS_TTL = 7 * 24 * 60 * 60
+ALL_TEAMS = "MLB"
+
+def get_teams_list(pool="American League", ofilen=None):
     """
     Place all the team abbreviations into a json file
     (data/abbreviations)
+
+    @param pool String major league pool of the league (American League,
+           National League, or MLB for both)
+    @param ofilen String output file (data/abbreviations.json if None)
     """
-    ofilen = os.sep.join(["data", "abbreviations.json"])
-    if os.path.exists(ofilen):
+    if ofilen is None:
+        ofilen = os.sep.join(["data", "abbreviations.json"])
+    if data_store.exists(ofilen):
         return
-    url_data = requests.get("https://www.cbssports.com/mlb/teams/")
-    soup = BeautifulSoup(url_data.content, "html.parser")
+    url_data = get_page("https://www.cbssports.com/mlb/teams/", TEAMS_TTL)
+    soup = make_soup(url_data,
+                     make_strainer("div", class_="TableBaseWrapper"), "teams")
     league_blks = soup.find_all("div", class_="TableBaseWrapper")
+    dup_teams = []
     for league_chk in league_blks:
         al_ind = league_chk.find_all("span", class_="TeamLogoNameLockup-name")
-        if al_ind[0].get_text().strip() == "American League":
-            dup_teams = []
+        if pool == ALL_TEAMS or al_ind[0].get_text().strip() == pool:
             tfields = league_chk.find_all("a", href=True)
             for team_info in tfields:
                 dup_teams.append(team_info["href"].split("/")[3])
-            answer = list(set(dup_teams))
-            with open(ofilen, "w", encoding="utf8") as ofile:
-                json.dump(answer, ofile, indent=4)
-            break
+            if pool != ALL_TEAMS:
+                break
+    if dup_teams:
+        answer = list(set(dup_teams))
+        data_store.save(ofilen, answer)
 
 if __name__ == "__main__":
     get_teams_list()
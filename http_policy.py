@@ -0,0 +1,184 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+http_policy -- the rules every http request follows.  Requests wait for a
+token from a token bucket shared by all threads and processes (its state
+is kept in a locked file), are sent with timeouts, and are retried with
+jittered exponential backoff on connection errors, timeouts, 429 and 5xx
+responses (honoring Retry-After).  Hosts that keep failing are cut off for
+a while by a per host circuit breaker.
+"""
+import os
+import json
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+POLICY = {
+    "per_second": 10.0,
+    "burst": 10,
+    "bucket_file": os.sep.join(["data", "http_bucket.json"]),
+    "timeout": (10, 30),
+    "retries": 4,
+    "backoff": 1.0,
+    "max_backoff": 60.0,
+    "retry_status": [429, 500, 502, 503, 504],
+    "breaker_failures": 5,
+    "breaker_cooldown": 120.0,
+}
+BUCKET_LOCK = threading.Lock()
+BREAKER_LOCK = threading.Lock()
+BREAKERS = {}
+
+def set_rate_limit(per_second, burst=None):
+    """
+    Set the request rate shared by every thread and process
+
+    @param per_second float requests per second (None for no limit)
+    @param burst int requests allowed at once after an idle period
+           (per_second, at least 1, if None)
+    """
+    POLICY["per_second"] = per_second
+    if per_second:
+        POLICY["burst"] = burst or max(1, int(per_second))
+
+def lock_file(bfile):
+    """
+    Take an exclusive lock on an open file (released when it is closed)
+
+    @param bfile open file object
+    """
+    if fcntl:
+        fcntl.flock(bfile.fileno(), fcntl.LOCK_EX)
+    else:
+        bfile.seek(0)
+        msvcrt.locking(bfile.fileno(), msvcrt.LK_LOCK, 1)
+
+def take_token():
+    """
+    Take a token from the shared bucket, sleeping until it is available.
+    The bucket is refilled at POLICY["per_second"] tokens per second up
+    to POLICY["burst"] tokens.  A token that is not available yet is
+    reserved so that waiting callers are served in order.
+    """
+    rate = POLICY["per_second"]
+    if not rate:
+        return
+    bucket_file = POLICY["bucket_file"]
+    dirname = os.path.dirname(bucket_file)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    with BUCKET_LOCK, open(bucket_file, "a+", encoding="utf8") as bfile:
+        lock_file(bfile)
+        bfile.seek(0)
+        try:
+            state = json.loads(bfile.read())
+        except ValueError:
+            state = {"tokens": POLICY["burst"], "updated": time.time()}
+        now = time.time()
+        tokens = min(POLICY["burst"], state["tokens"] +
+                     (now - state["updated"]) * rate)
+        tokens -= 1
+        bfile.seek(0)
+        bfile.truncate()
+        bfile.write(json.dumps({"tokens": tokens, "updated": now}))
+    if tokens < 0:
+        time.sleep(-tokens / rate)
+
+def breaker_check(host):
+    """
+    Refuse to contact a host whose circuit breaker is open
+
+    @param host String host name
+    """
+    with BREAKER_LOCK:
+        breaker = BREAKERS.get(host)
+        if breaker and breaker["open_until"] > time.monotonic():
+            raise ConnectionError(
+                f"{host} failed {breaker['failures']} times in a row; not "
+                "contacted until the circuit breaker closes")
+
+def breaker_record(host, success):
+    """
+    Record the outcome of a request in the host's circuit breaker
+
+    @param host String host name
+    @param success boolean
+    """
+    with BREAKER_LOCK:
+        breaker = BREAKERS.setdefault(host, {"failures": 0,
+                                             "open_until": 0.0})
+        if success:
+            breaker["failures"] = 0
+            return
+        breaker["failures"] += 1
+        if breaker["failures"] >= POLICY["breaker_failures"]:
+            breaker["open_until"] = (time.monotonic() +
+                                     POLICY["breaker_cooldown"])
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Compute how long to wait before the next attempt (full jitter)
+
+    @param attempt int number of attempts made so far
+    @param retry_after String Retry-After header value (optional)
+    @return float seconds
+    """
+    cap = min(POLICY["max_backoff"], POLICY["backoff"] * 2 ** attempt)
+    delay = random.uniform(0, cap)
+    if retry_after:
+        try:
+            wanted = float(retry_after)
+        except ValueError:
+            try:
+                wanted = (parsedate_to_datetime(retry_after).timestamp() -
+                          time.time())
+            except (TypeError, ValueError):
+                wanted = 0
+        delay = max(delay, min(wanted, POLICY["max_backoff"]))
+    return delay
+
+def fetch(session, url, headers=None):
+    """
+    Send a GET request following the policy
+
+    @param session requests.Session object
+    @param url String address of page
+    @param headers dict extra request headers (optional)
+    @return requests.Response object (any status other than the retried
+            ones)
+    """
+    import requests  # pylint: disable=import-outside-toplevel
+    host = urlparse(url).hostname or "unknown"
+    problem = None
+    retry_after = None
+    for attempt in range(POLICY["retries"] + 1):
+        breaker_check(host)
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1, retry_after))
+        take_token()
+        retry_after = None
+        try:
+            resp = session.get(url, headers=headers,
+                               timeout=POLICY["timeout"])
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            problem = str(exc)
+            breaker_record(host, False)
+            continue
+        if resp.status_code in POLICY["retry_status"]:
+            problem = f"status {resp.status_code}"
+            retry_after = resp.headers.get("Retry-After")
+            breaker_record(host, False)
+            continue
+        breaker_record(host, True)
+        return resp
+    raise ConnectionError(f"{url}: giving up after "
+                          f"{POLICY['retries'] + 1} attempts ({problem})")
@@ -0,0 +1,168 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+Poll the scoreboard while games are being played and keep the day's stats
+and team pages current.  Only boxscores of games whose scoreboard state
+changed are refetched, and only pages of teams with changed players are
+rewritten.  Usage:
+
+    python live_poll.py [YYYY-mm-dd] [--interval SECONDS] [--metrics FILE]
+                        [--profile cpu|memory]
+
+The metrics file is rewritten after every poll.
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from get_day_stats import extract_raw_data, process_raw_data
+from game_index import league_games, PLAYED, OVER
+from get_daily_roto_scores import get_daily_roto_scores
+from get_team_abbrev import get_teams_list
+from get_roto_teams import get_league_team_data
+from gen_html_files import gen_html_files, page_files_wanted
+import data_store
+import metrics
+
+POLL_INTERVAL = 60
+
+def refresh_game(boxscore, game_info):
+    """
+    Refetch a boxscore and reprocess it if its content changed
+
+    @param boxscore String link to box score page
+    @param game_info dict last known raw_data hash and records of this game
+                     (updated in place)
+    @return boolean True if the game's records changed
+    """
+    raw_data = extract_raw_data(boxscore, fresh=True)
+    rhash = hashlib.sha256(json.dumps(raw_data).encode("utf-8")).hexdigest()
+    if rhash == game_info.get("raw_hash"):
+        return False
+    game_info["raw_hash"] = rhash
+    game_info["records"] = {str(pkey): pinfo for pkey, pinfo
+                            in process_raw_data(raw_data).items()}
+    return True
+
+def changed_teams(rday, changed_players):
+    """
+    Find the Rotisserie teams that have any of the changed players
+
+    @param rday datetime day being polled
+    @param changed_players set of player numbers whose lines changed
+    @return set of Rotisserie team names
+    """
+    txt_rday = rday.strftime("%Y%m%d")
+    rteams = data_store.load(os.sep.join(["data",
+                                          f"rteams_on_{txt_rday}.json"]))
+    retv = set()
+    for rteam, tinfo in rteams.items():
+        for ptype in ['batters', 'pitchers']:
+            if changed_players & set(tinfo[ptype]):
+                retv.add(rteam)
+    return retv
+
+def update_outputs(rday, games, old_stats):
+    """
+    Rewrite the day's stats file and the pages of affected teams
+
+    @param rday datetime day being polled
+    @param games dict game id -> game info, in scoreboard order
+    @param old_stats dict stats written by the previous update
+    @return dict new stats for the day
+    """
+    txt_rday = rday.strftime("%Y%m%d")
+    stats = {}
+    for game_info in games.values():
+        stats.update(game_info.get("records", {}))
+    changed_players = {pkey for pkey in set(stats) | set(old_stats)
+                       if stats.get(pkey) != old_stats.get(pkey)}
+    data_store.save(os.sep.join(["data", f"stats_on_{txt_rday}.json"]),
+                    stats)
+    rteams_file = os.sep.join(["data", f"rteams_on_{txt_rday}.json"])
+    data_store.remove(rteams_file)
+    get_daily_roto_scores(rday)
+    if page_files_wanted():
+        gen_html_files(rday, changed_teams(rday, changed_players))
+    return stats
+
+def poll_day(rday, interval=POLL_INTERVAL, max_polls=None,
+             metrics_file=None):
+    """
+    Poll until every league game of the day is over (at once on a day
+    without league games).  Games that have not started are not fetched.
+    A scoreboard or boxscore that cannot be read is tried again on the
+    next poll.  The team abbreviations and the period's league file are
+    collected first if they do not exist yet (a new data directory or the
+    first day of a roster period).
+
+    @param rday datetime day being polled
+    @param interval int seconds between scoreboard reads
+    @param max_polls int stop after this many polls (None to run until
+           all games are over)
+    @param metrics_file String metrics file rewritten after every poll
+           (None for no file)
+    """
+    with metrics.timed("poll", "setup"):
+        get_teams_list()
+        get_league_team_data(rday)
+    games = {}
+    stats = {}
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        polls += 1
+        metrics.add_count("poll", "polls")
+        try:
+            with metrics.timed("poll", "scoreboard"):
+                states = league_games(rday, fresh=True)
+        except ConnectionError as exc:
+            print("Scoreboard not read:", exc)
+            metrics.add_count("poll", "fetch_errors")
+            time.sleep(interval)
+            continue
+        changed = False
+        for game_id, game in states.items():
+            game_info = games.setdefault(game_id, {})
+            if game_info.get("state") == game["state"]:
+                continue
+            game_info["state"] = game["state"]
+            if game["status"] not in PLAYED:
+                continue
+            try:
+                with metrics.timed("poll", "boxscore"):
+                    updated = refresh_game(game["link"], game_info)
+            except ConnectionError as exc:
+                print("Boxscore not read:", exc)
+                metrics.add_count("poll", "fetch_errors")
+                game_info["state"] = None
+                continue
+            if updated:
+                print("Updated", game_id, game["text"])
+                changed = True
+        if changed:
+            games = {game_id: games[game_id] for game_id in states}
+            with metrics.timed("poll", "update"):
+                stats = update_outputs(rday, games, stats)
+        if metrics_file:
+            metrics.write_metrics(metrics_file)
+        if all(game["status"] in OVER for game in states.values()):
+            break
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("day", nargs="?",
+                        default=datetime.now().strftime("%Y-%m-%d"))
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL)
+    parser.add_argument("--metrics", default=metrics.METRICS_FILE)
+    parser.add_argument("--profile", choices=["cpu", "memory"])
+    args = parser.parse_args()
+    try:
+        metrics.profile_call(args.profile, poll_day,
+                             datetime.strptime(args.day, "%Y-%m-%d"),
+                             args.interval, None, args.metrics)
+    finally:
+        metrics.write_metrics(args.metrics)
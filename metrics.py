@@ -0,0 +1,199 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+metrics -- run instrumentation.  Collects stage wall times, http requests
+and bytes per host, page cache hits, page parse times and Selenium wait
+times, and writes them to a json or Prometheus textfile.  A run can also
+be profiled with cProfile or tracemalloc.  The cProfile mode also profiles
+every thread started during the run (stage, boxscore and roster workers).
+"""
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+METRICS_LOCK = threading.Lock()
+METRICS = {"timers": {}, "counters": {}}
+METRICS_FILE = os.sep.join(["data", "metrics.json"])
+PROFILE_LINES = 30
+PROFILE_LOCK = threading.Lock()
+THREAD_PROFILERS = []
+
+def reset():
+    """
+    Clear everything collected so far
+    """
+    with METRICS_LOCK:
+        METRICS["timers"] = {}
+        METRICS["counters"] = {}
+
+def add_time(kind, name, seconds):
+    """
+    Add an elapsed time to a timer
+
+    @param kind String timer group (stage, parse, selenium_wait)
+    @param name String timer name within the group
+    @param seconds float elapsed time
+    """
+    with METRICS_LOCK:
+        entry = METRICS["timers"].setdefault(kind, {}).setdefault(
+            name, {"count": 0, "seconds": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+
+def add_count(kind, name, amount=1):
+    """
+    Add to a counter
+
+    @param kind String counter group (http_requests, http_bytes, ...)
+    @param name String counter name within the group (host name)
+    @param amount int amount added
+    """
+    with METRICS_LOCK:
+        group = METRICS["counters"].setdefault(kind, {})
+        group[name] = group.get(name, 0) + amount
+
+@contextmanager
+def timed(kind, name):
+    """
+    Time a block of code
+
+    @param kind String timer group
+    @param name String timer name within the group
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(kind, name, time.perf_counter() - start)
+
+def count_response(resp, *_args, **_kwargs):
+    """
+    Requests response hook counting requests and bytes per host
+
+    @param resp requests.Response object
+    @return None (the response is not replaced)
+    """
+    host = urlparse(resp.url).hostname or "unknown"
+    add_count("http_requests", host)
+    add_count("http_bytes", host, len(resp.content))
+    add_count("http_status", str(resp.status_code))
+
+def count_cache_hit(url):
+    """
+    Count a page served from the page cache without network traffic
+
+    @param url String address of page
+    """
+    add_count("cache_hits", urlparse(url).hostname or "unknown")
+
+def snapshot():
+    """
+    Get a copy of everything collected so far
+
+    @return dict with timers and counters
+    """
+    with METRICS_LOCK:
+        return json.loads(json.dumps(METRICS))
+
+def prometheus_text(data):
+    """
+    Format metrics in the Prometheus textfile format
+
+    @param data dict returned by snapshot
+    @return String metrics text
+    """
+    lines = []
+    for kind, timers in sorted(data["timers"].items()):
+        for field in ["count", "seconds", "max"]:
+            metric = f"roto_{kind}_{field}"
+            lines.append(f"# TYPE {metric} gauge")
+            for name, entry in sorted(timers.items()):
+                lines.append(f'{metric}{{name="{name}"}} {entry[field]}')
+    for kind, counters in sorted(data["counters"].items()):
+        metric = f"roto_{kind}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for name, value in sorted(counters.items()):
+            lines.append(f'{metric}{{name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics(fname=METRICS_FILE):
+    """
+    Save the metrics.  A .prom file name selects the Prometheus textfile
+    format, anything else is written as json.
+
+    @param fname String output file name
+    """
+    data = snapshot()
+    data["written"] = time.time()
+    dirname = os.path.dirname(fname)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    with open(fname + ".tmp", "w", encoding="utf8") as mfile:
+        if fname.endswith(".prom"):
+            mfile.write(prometheus_text(data))
+        else:
+            json.dump(data, mfile, indent=4)
+    os.replace(fname + ".tmp", fname)
+
+def profile_thread(*_):
+    """
+    Profile hook installed with threading.setprofile: on the first event
+    in a new thread, replace itself with a cProfile profiler for that
+    thread
+    """
+    sys.setprofile(None)
+    profiler = cProfile.Profile()
+    with PROFILE_LOCK:
+        THREAD_PROFILERS.append(profiler)
+    profiler.enable()
+
+def profile_call(mode, func, *args):
+    """
+    Run a function under a profiler and print the report.  The cpu report
+    combines the calling thread with every thread started during the call.
+
+    @param mode String cpu (cProfile), memory (tracemalloc) or None
+    @param func function to run
+    @param args arguments passed to func
+    @return value returned by func
+    """
+    if mode == "cpu":
+        profiler = cProfile.Profile()
+        THREAD_PROFILERS.clear()
+        threading.setprofile(profile_thread)
+        try:
+            retv = profiler.runcall(func, *args)
+        finally:
+            threading.setprofile(None)
+            report = io.StringIO()
+            stats = pstats.Stats(profiler, stream=report)
+            with PROFILE_LOCK:
+                for tprofiler in THREAD_PROFILERS:
+                    tprofiler.disable()
+                    stats.add(tprofiler)
+            stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+            print(report.getvalue())
+        return retv
+    if mode == "memory":
+        tracemalloc.start()
+        try:
+            retv = func(*args)
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")
+        finally:
+            tracemalloc.stop()
+        print(f"Memory: {current} bytes allocated, {peak} bytes peak")
+        for stat in top[:PROFILE_LINES]:
+            print(stat)
+        return retv
+    return func(*args)
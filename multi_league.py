@@ -0,0 +1,131 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+Produce a day's files for every league in roto.ini.  Usage:
+
+    python multi_league.py [YYYY-mm-dd] [--league NAME ...]
+
+Every section of roto.ini other than DEFAULT describes a league (keys not
+set in a section are taken from DEFAULT).  Besides the DEFAULT keys a
+section may set pool (American League, National League or MLB; American
+League if not set).  A league's data files are kept in data/<section> and
+its pages in <section>/html_files_<date>.  A roto.ini without sections
+describes the single DEFAULT league, kept in data and html_files_<date> as
+update_day does.  The MLB stats for the day are scraped once, for the
+union of the teams in all the pools (saved in data/multi_league_teams.json;
+each league's own abbreviations.json is left alone), into the shared
+data/stats_on_<date>.json file.
+"""
+import os
+import argparse
+from datetime import datetime, timedelta
+from configparser import ConfigParser
+from get_team_abbrev import get_teams_list
+from get_roto_teams import get_league_team_data
+from get_day_stats import get_players_on_date
+from get_daily_roto_scores import get_daily_roto_scores
+from gen_html_files import gen_html_files, page_files_wanted
+import data_store
+
+DEFAULT_POOL = "American League"
+COVERAGE_FILE = os.sep.join(["data", "multi_league.json"])
+UNION_FILE = os.sep.join(["data", "multi_league_teams.json"])
+
+def get_leagues(names=None):
+    """
+    Read the league sections of roto.ini
+
+    @param names list of section names to use (all if None)
+    @return dict section name -> dict with section, pool, ldir and
+            html_root
+    """
+    config = ConfigParser()
+    config.read('roto.ini')
+    retv = {}
+    if not config.sections():
+        retv["DEFAULT"] = {"section": "DEFAULT",
+                           "pool": config["DEFAULT"].get("pool",
+                                                         DEFAULT_POOL),
+                           "ldir": "data", "html_root": None}
+    for section in config.sections():
+        retv[section] = {"section": section,
+                         "pool": config[section].get("pool", DEFAULT_POOL),
+                         "ldir": os.sep.join(["data", section]),
+                         "html_root": section}
+    if names:
+        retv = {section: linfo for section, linfo in retv.items()
+                if section in names}
+    if not retv:
+        raise ValueError("no leagues to run: roto.ini has no section named "
+                         f"{', '.join(names or [])}")
+    return retv
+
+def shared_teams(leagues):
+    """
+    Make sure every league has its team list and save the union of the
+    lists in UNION_FILE for the stats scrape
+
+    @param leagues dict returned by get_leagues
+    @return list of team abbreviations in any league's pool
+    """
+    union = set()
+    for linfo in leagues.values():
+        os.makedirs(linfo["ldir"], exist_ok=True)
+        abbrevs = os.sep.join([linfo["ldir"], "abbreviations.json"])
+        get_teams_list(linfo["pool"], abbrevs)
+        union.update(data_store.load(abbrevs))
+    union = sorted(union)
+    data_store.save(UNION_FILE, union)
+    return union
+
+def shared_stats(rday, union):
+    """
+    Scrape the day's stats once for all leagues.  A stats file scraped for
+    a smaller set of teams is scraped again (the pages already read come
+    from the page cache).
+
+    @param rday datetime day
+    @param union list of team abbreviations needed
+    """
+    txt_rday = rday.strftime("%Y%m%d")
+    coverage = {}
+    if data_store.exists(COVERAGE_FILE):
+        coverage = data_store.load(COVERAGE_FILE)
+    stats = os.sep.join(["data", f"stats_on_{txt_rday}.json"])
+    if data_store.exists(stats) and not set(union) <= set(
+            coverage.get(txt_rday, [])):
+        data_store.remove(stats)
+    get_players_on_date(rday, teams_file=UNION_FILE)
+    coverage[txt_rday] = union
+    data_store.save(COVERAGE_FILE, coverage)
+
+def run_leagues(rday, names=None):
+    """
+    Produce the files for a day for several leagues
+
+    @param rday datetime day
+    @param names list of roto.ini sections to run (all if None)
+    """
+    leagues = get_leagues(names)
+    union = shared_teams(leagues)
+    for linfo in leagues.values():
+        get_league_team_data(rday, linfo["section"], linfo["ldir"])
+    shared_stats(rday, union)
+    for linfo in leagues.values():
+        get_daily_roto_scores(rday, ldir=linfo["ldir"])
+        if page_files_wanted():
+            gen_html_files(rday, ldir=linfo["ldir"],
+                           html_root=linfo["html_root"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("day", nargs="?")
+    parser.add_argument("--league", nargs="*")
+    args = parser.parse_args()
+    if args.day:
+        run_day = datetime.strptime(args.day, "%Y-%m-%d")
+    else:
+        run_day = datetime.now() - timedelta(days=1)
+    run_leagues(run_day, args.league)
@@ -0,0 +1,265 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+page_fetch -- shared http access for the scraping modules.  All pages are
+read through one pooled keep-alive session and an on-disk response cache
+(data/http_cache) keyed by url.  requests is only imported when a page
+has to come from the network.  Network requests follow http_policy (rate
+limit, timeouts, retries and circuit breakers).  A response other than
+200 (or 304 for a cached page) raises ConnectionError rather than being
+returned as page content.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import metrics
+import http_policy
+
+POOL_SIZE = 16
+SESSION_LOCK = threading.Lock()
+SESSION_INFO = {}
+CACHE_LOCK = threading.Lock()
+CACHE_BYTES = {}
+CACHE_SETTINGS = {
+    "directory": os.sep.join(["data", "http_cache"]),
+    "enabled": True,
+    "offline": False,
+    "max_bytes": 512 * 1024 * 1024,
+    "evict_to": 0.9,
+}
+LIVE_TTL = 120
+NEVER_EXPIRES = None
+
+def get_session():
+    """
+    Return the shared requests session, creating it on first use
+
+    @return requests.Session object with a connection pool large enough for
+            concurrent boxscore fetches
+    """
+    with SESSION_LOCK:
+        if "session" not in SESSION_INFO:
+            # pylint: disable=import-outside-toplevel
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                                  pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(metrics.count_response)
+            SESSION_INFO["session"] = session
+        return SESSION_INFO["session"]
+
+def set_offline(offline=True):
+    """
+    Turn offline replay mode on or off.  In offline mode every page must
+    come from the cache and no network traffic is generated.
+
+    @param offline boolean
+    """
+    CACHE_SETTINGS["offline"] = offline
+
+def ttl_for_date(game_date):
+    """
+    Pick a cache lifetime for pages describing games on game_date.  Games
+    from before yesterday are final and never expire.  Anything newer may
+    still be in progress.
+
+    @param game_date datetime date of the games
+    @return int seconds, or NEVER_EXPIRES
+    """
+    if game_date.date() < (datetime.now() - timedelta(days=1)).date():
+        return NEVER_EXPIRES
+    return LIVE_TTL
+
+def cache_paths(url):
+    """
+    Get the cache file names for a url
+
+    @param url String address of page
+    @return tuple (body file name, metadata file name)
+    """
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.sep.join([CACHE_SETTINGS["directory"], key])
+    return f"{base}.body", f"{base}.json"
+
+def cached_digest(url):
+    """
+    Hash the cached copy of a page
+
+    @param url String address of page
+    @return String hex digest (None if the page is not cached)
+    """
+    body_file = cache_paths(url)[0]
+    if not os.path.exists(body_file):
+        return None
+    with open(body_file, "rb") as bfile:
+        return hashlib.sha256(bfile.read()).hexdigest()
+
+def read_cache(url):
+    """
+    Read a cached response
+
+    @param url String address of page
+    @return tuple (metadata dict, bytes body) or (None, None) if not cached
+    """
+    body_file, meta_file = cache_paths(url)
+    if not (os.path.exists(body_file) and os.path.exists(meta_file)):
+        return None, None
+    with open(meta_file, "r", encoding="utf8") as mfile:
+        meta = json.load(mfile)
+    with open(body_file, "rb") as bfile:
+        body = bfile.read()
+    os.utime(body_file)
+    return meta, body
+
+def replace_file(fname, data):
+    """
+    Write a file through a uniquely named temporary file in the same
+    directory, so concurrent writers never share a partial file
+
+    @param fname String file name
+    @param data bytes file content
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(fname),
+                                     suffix=".tmp", delete=False) as tfile:
+        tfile.write(data)
+    os.replace(tfile.name, fname)
+
+def write_cache(url, meta, body):
+    """
+    Save a response in the cache and trim the cache if it is too large
+
+    @param url String address of page
+    @param meta dict response metadata (etag, last_modified, fetched, ttl)
+    @param body bytes page content (None if the body is unchanged)
+    """
+    os.makedirs(CACHE_SETTINGS["directory"], exist_ok=True)
+    body_file, meta_file = cache_paths(url)
+    if body is not None:
+        old_size = (os.path.getsize(body_file) if os.path.exists(body_file)
+                    else 0)
+        replace_file(body_file, body)
+        add_cache_bytes(len(body) - old_size)
+    replace_file(meta_file, json.dumps(meta, indent=4).encode("utf8"))
+
+def cache_entries(cdir):
+    """
+    List the cached bodies in a cache directory
+
+    @param cdir String cache directory
+    @return list of (modification time, size, body file name)
+    """
+    entries = []
+    for fname in os.listdir(cdir):
+        if fname.endswith(".body"):
+            fstat = os.stat(os.sep.join([cdir, fname]))
+            entries.append((fstat.st_mtime, fstat.st_size, fname))
+    return entries
+
+def add_cache_bytes(amount):
+    """
+    Keep a running total of the bytes in the cache directory (counted
+    once per process) and evict when it passes CACHE_SETTINGS["max_bytes"]
+
+    @param amount int change in cached bytes
+    """
+    with CACHE_LOCK:
+        cdir = CACHE_SETTINGS["directory"]
+        if cdir not in CACHE_BYTES:
+            CACHE_BYTES[cdir] = sum(entry[1] for entry in cache_entries(cdir))
+        else:
+            CACHE_BYTES[cdir] += amount
+        if CACHE_BYTES[cdir] > CACHE_SETTINGS["max_bytes"]:
+            CACHE_BYTES[cdir] = evict_cache(cdir)
+
+def evict_cache(cdir):
+    """
+    Remove least recently used responses until the cache is back below
+    CACHE_SETTINGS["evict_to"] of CACHE_SETTINGS["max_bytes"] (so that
+    the next eviction scan is many writes away).  Called with CACHE_LOCK
+    held.
+
+    @param cdir String cache directory
+    @return int bytes left in the cache
+    """
+    entries = cache_entries(cdir)
+    total = sum(entry[1] for entry in entries)
+    limit = CACHE_SETTINGS["max_bytes"] * CACHE_SETTINGS["evict_to"]
+    for _, size, fname in sorted(entries):
+        if total <= limit:
+            break
+        for ext in [".body", ".json"]:
+            old_file = os.sep.join([cdir, fname[:-5] + ext])
+            if os.path.exists(old_file):
+                os.remove(old_file)
+        total -= size
+    return total
+
+def is_fresh(meta, ttl, now):
+    """
+    Decide whether a cached page can be used without asking the server.
+    The page must be younger than both the ttl it was stored with and the
+    ttl of the current request.
+
+    @param meta dict cached response metadata
+    @param ttl int seconds the caller allows (NEVER_EXPIRES for no limit)
+    @param now float current time
+    @return boolean
+    """
+    limits = [limit for limit in (ttl, meta["ttl"]) if limit is not None]
+    return not limits or now - meta["fetched"] < min(limits)
+
+def get_page(url, ttl=NEVER_EXPIRES):
+    """
+    Read a web page.  Cached pages younger than both ttl and the ttl they
+    were stored with are returned without network traffic.  Older cached
+    pages are revalidated using ETag and Last-Modified headers (a ttl of 0
+    always revalidates), and the entry keeps the new ttl.
+
+    @param url String address of page
+    @param ttl int seconds a cached copy stays fresh (NEVER_EXPIRES for
+           pages that do not change)
+    @return bytes content of the page (ConnectionError is raised for an
+            error status)
+    """
+    if not CACHE_SETTINGS["enabled"]:
+        resp = http_policy.fetch(get_session(), url)
+        if resp.status_code != 200:
+            raise ConnectionError(f"{url}: status {resp.status_code}")
+        return resp.content
+    meta, body = read_cache(url)
+    if CACHE_SETTINGS["offline"]:
+        if body is None:
+            raise FileNotFoundError(f"{url} is not cached (offline mode)")
+        metrics.count_cache_hit(url)
+        return body
+    now = time.time()
+    if body is not None and is_fresh(meta, ttl, now):
+        metrics.count_cache_hit(url)
+        return body
+    headers = {}
+    if body is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    resp = http_policy.fetch(get_session(), url, headers)
+    if resp.status_code == 304 and body is not None:
+        meta["fetched"] = now
+        meta["ttl"] = ttl
+        write_cache(url, meta, None)
+        return body
+    if resp.status_code != 200:
+        raise ConnectionError(f"{url}: status {resp.status_code}")
+    new_meta = {"url": url, "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "fetched": now, "ttl": ttl}
+    write_cache(url, new_meta, resp.content)
+    return resp.content
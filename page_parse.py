@@ -0,0 +1,101 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+page_parse -- Beautiful Soup parser backend shared by the scraping modules.
+Uses lxml when it is installed and only builds the parts of a page that
+are actually read when restricted parsing is turned on.  Beautiful Soup
+and lxml are imported on the first parse.
+"""
+import metrics
+
+def pick_engine():
+    """
+    Choose the fastest parser engine available
+
+    @return String Beautiful Soup parser name
+    """
+    try:
+        import lxml  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+PARSE_SETTINGS = {"engine": None, "restricted": True}
+
+def get_engine():
+    """
+    Get the parser engine, choosing it on first use
+
+    @return String Beautiful Soup parser name
+    """
+    if PARSE_SETTINGS["engine"] is None:
+        PARSE_SETTINGS["engine"] = pick_engine()
+    return PARSE_SETTINGS["engine"]
+
+def make_strainer(name, **attrs):
+    """
+    Build a SoupStrainer for make_soup
+
+    @param name String tag name
+    @param attrs tag attributes to match (class_, href, ...)
+    @return SoupStrainer object
+    """
+    from bs4 import SoupStrainer  # pylint: disable=import-outside-toplevel
+    return SoupStrainer(name, **attrs)
+
+def make_soup(content, only=None, kind="page"):
+    """
+    Parse a page with the configured engine.  The parse time is recorded
+    in the parse metrics under the page kind and engine (boxscore/lxml for
+    example).
+
+    @param content bytes or String page text
+    @param only SoupStrainer limiting what gets built (ignored when
+           restricted parsing is off)
+    @param kind String kind of page (scoreboard, boxscore, teams,
+           standings, roster)
+    @return BeautifulSoup object
+    """
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+    if not PARSE_SETTINGS["restricted"]:
+        only = None
+    engine = get_engine()
+    with metrics.timed("parse", f"{kind}/{engine}"):
+        return BeautifulSoup(content, engine, parse_only=only)
+
+def get_tables(content, kind="page"):
+    """
+    Parse the tables on a page
+
+    @param content bytes page text
+    @param kind String kind of page (for the parse metrics)
+    @return tuple (list of <table> tags, String encoding used to decode
+            the page)
+    """
+    soup = make_soup(content, make_strainer("table"), kind)
+    return soup.find_all("table"), soup.original_encoding
+
+def get_text_soup(content, marker, encoding=None, kind="page"):
+    """
+    Get a soup whose text contains everything from the first text node
+    starting with marker to the end of the page.  Text before that point
+    is never built when restricted parsing is on.  Falls back to parsing
+    the whole page if the marker is not at the start of a text node.
+
+    @param content bytes page text
+    @param marker String text we are looking for (BASERUNNING for example)
+    @param encoding String encoding of content (from get_tables)
+    @param kind String kind of page (for the parse metrics)
+    @return BeautifulSoup object
+    """
+    if not PARSE_SETTINGS["restricted"] or not isinstance(content, bytes):
+        return make_soup(content, kind=kind)
+    txt = content.decode(encoding or "utf-8", errors="replace")
+    mloc = txt.find(marker)
+    if mloc < 0 or not txt[:mloc].rstrip().endswith(">"):
+        return make_soup(content, kind=kind)
+    tag_start = txt.rfind("<", 0, mloc)
+    if tag_start < 0 or txt[tag_start + 1:tag_start + 2] in ["/", "!"]:
+        return make_soup(content, kind=kind)
+    return make_soup(txt[tag_start:], kind=kind)
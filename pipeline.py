@@ -0,0 +1,207 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+pipeline -- run the stages that produce a day's files as a dependency
+graph.  Each stage declares the data files it reads and writes.  A stage
+runs when an output is missing, when the contents of one of its inputs
+changed since it last ran (hashes are kept in data/pipeline_state.json),
+or when it is forced.  The stats stage also hashes the cached boxscore
+pages of the day's games.  Final boxscores never expire from the page
+cache, so when stats is forced or the day is within RECHECK_DAYS of today
+they are first revalidated with conditional requests; a corrected
+boxscore then replaces the cached copy and reruns stats and everything
+built from it.  Stages whose inputs are
+ready run concurrently.  In offline mode stages that need a Cbs login are
+skipped whenever their outputs exist, and the other scraping stages read
+their pages from the page cache.
+"""
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from get_team_abbrev import get_teams_list
+from get_roto_teams import get_league_team_data, get_weekly_league_file
+from get_day_stats import get_players_on_date, boxscore_digests
+from get_day_stats import revalidate_boxscores
+from game_index import load_game_index, index_file
+from get_daily_roto_scores import get_daily_roto_scores
+from gen_html_files import gen_html_files, page_files_wanted
+from season_rollup import fold_day
+from page_fetch import set_offline
+import data_store
+import metrics
+
+STATE_FILE = os.sep.join(["data", "pipeline_state.json"])
+STAGE_WORKERS = 3
+RECHECK_DAYS = 3
+
+def get_stages(test_day):
+    """
+    Describe the stages for a day
+
+    @param test_day datetime day being produced
+    @return dict stage name -> dict with func (called with no arguments),
+            needs (stage names), inputs and outputs (data file names),
+            pages (optional function returning more input hashes by
+            name), refresh and recent (optional function that updates the
+            cached pages behind pages, run when the stage is forced or
+            recent is set), always (run every time; the stage does its
+            own change checks) and network (cache if the stage reads
+            pages that can come from the page cache, login if it needs a
+            live Cbs login).
+            There is no html stage when roto.ini sets pages = server.
+    """
+    txt_day = test_day.strftime("%Y%m%d")
+    abbrevs = os.sep.join(["data", "abbreviations.json"])
+    league = get_weekly_league_file(test_day)
+    games = index_file(test_day)
+    stats = os.sep.join(["data", f"stats_on_{txt_day}.json"])
+    rteams = os.sep.join(["data", f"rteams_on_{txt_day}.json"])
+    stages = {
+        "teams": {"func": get_teams_list, "needs": [], "inputs": [],
+                  "outputs": [abbrevs], "network": "cache"},
+        "rosters": {"func": lambda: get_league_team_data(test_day),
+                    "needs": [], "inputs": [], "outputs": [league],
+                    "network": "login"},
+        "games": {"func": lambda: load_game_index(test_day), "needs": [],
+                  "inputs": [], "outputs": [games], "always": True,
+                  "network": "cache"},
+        "stats": {"func": lambda: get_players_on_date(test_day),
+                  "needs": ["teams", "games"], "inputs": [abbrevs, games],
+                  "pages": lambda: boxscore_digests(test_day),
+                  "refresh": lambda: revalidate_boxscores(test_day),
+                  "recent": (datetime.now() - test_day).days < RECHECK_DAYS,
+                  "outputs": [stats], "network": "cache"},
+        "join": {"func": lambda: get_daily_roto_scores(test_day),
+                 "needs": ["rosters", "stats"], "inputs": [league, stats],
+                 "outputs": [rteams]},
+        "rollup": {"func": lambda: fold_day(test_day),
+                   "needs": ["rosters", "stats"], "inputs": [league, stats],
+                   "outputs": []},
+        "html": {"func": lambda: gen_html_files(test_day),
+                 "needs": ["join", "teams"],
+                 "inputs": [rteams, stats, abbrevs], "outputs": [],
+                 "always": True},
+    }
+    if not page_files_wanted():
+        del stages["html"]
+    return stages
+
+def input_digests(stage):
+    """
+    Hash the inputs of a stage
+
+    @param stage dict stage description
+    @return dict input name -> hash (None if missing)
+    """
+    retv = {ifile: data_store.digest(ifile) for ifile in stage["inputs"]}
+    if "pages" in stage:
+        retv.update(stage["pages"]())
+    return retv
+
+def stale_reason(name, stage, state_key, state, force, offline=False):
+    """
+    Decide if a stage has to run
+
+    @param name String stage name
+    @param stage dict stage description
+    @param state_key String key of this stage in the state file
+    @param state dict saved input hashes
+    @param force list of forced stage names ('all' forces every stage)
+    @param offline boolean no network access
+    @return String reason the stage must run (None if it is up to date)
+    """
+    forced = name in force or "all" in force
+    if offline and stage.get("network") == "login":
+        missing = [ofile for ofile in stage["outputs"]
+                   if not data_store.exists(ofile)]
+        if not (missing or forced):
+            return None
+        raise FileNotFoundError(
+            f"{name} needs a Cbs login and cannot run offline")
+    if "refresh" in stage and not offline and (forced or stage["recent"]):
+        stage["refresh"]()
+    if forced:
+        return "forced"
+    if stage.get("always") and not (offline and stage.get("network")):
+        return "always runs"
+    for ofile in stage["outputs"]:
+        if not data_store.exists(ofile):
+            return f"{ofile} missing"
+    saved = state.get(state_key, {})
+    current = input_digests(stage)
+    for ifile in sorted(set(saved) | set(current)):
+        if saved.get(ifile) != current.get(ifile):
+            return f"{ifile} changed"
+    return None
+
+def run_stage(name, stage):
+    """
+    Run a stage after removing its old outputs (the stage functions skip
+    their work when their output already exists)
+
+    @param name String stage name
+    @param stage dict stage description
+    """
+    for ofile in stage["outputs"]:
+        data_store.remove(ofile)
+    with metrics.timed("stage", name):
+        stage["func"]()
+
+def run_pipeline(test_day, force=(), dry_run=(), workers=STAGE_WORKERS,
+                 offline=False):
+    """
+    Produce the files for a day
+
+    @param test_day datetime day being produced
+    @param force list of stage names to run even if up to date
+    @param dry_run list of stage names that only report whether they would
+           run ('all' for every stage); the other stages run as usual
+    @param workers int number of stages that may run at the same time
+    @param offline boolean build from saved data and cached pages only
+    @return dict stage name -> reason it ran (None if it was skipped)
+    """
+    if offline:
+        set_offline(True)
+    stages = get_stages(test_day)
+    state = data_store.load(STATE_FILE) if data_store.exists(
+        STATE_FILE) else {}
+    txt_day = test_day.strftime("%Y%m%d")
+    results = {}
+    skipped = set()
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            for name in list(pending):
+                stage = pending[name]
+                if any(need not in results for need in stage["needs"]):
+                    continue
+                del pending[name]
+                state_key = f"{name}@{txt_day}"
+                reason = stale_reason(name, stage, state_key, state, force,
+                                      offline)
+                dry = name in dry_run or "all" in dry_run
+                if reason is None and dry and any(
+                        results[need] and need in skipped
+                        for need in stage["needs"]):
+                    reason = "upstream would run"
+                print(f"{name}: {reason or 'up to date'}"
+                      f"{' (dry run)' if dry and reason else ''}")
+                if reason is None or dry:
+                    results[name] = reason
+                    if dry:
+                        skipped.add(name)
+                    continue
+                running[pool.submit(run_stage, name, stage)] = (name, reason)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, reason = running.pop(future)
+                future.result()
+                results[name] = reason
+                state[f"{name}@{txt_day}"] = input_digests(stages[name])
+    if "all" not in dry_run:
+        data_store.save(STATE_FILE, state)
+    return results
@@ -0,0 +1,134 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+player_registry -- season wide map of Cbs player numbers to normalized
+names.  Used to attribute name-keyed boxscore text (BASERUNNING lines) to
+player numbers without scanning every player in a game.  Names are matched
+within a team, so players with the same name on the two teams in a game
+are told apart.
+"""
+import os
+import threading
+import unicodedata
+import data_store
+
+REGISTRY_FILE = os.sep.join(["data", "player_registry.json"])
+REGISTRY_LOCK = threading.Lock()
+REGISTRY = {}
+NAME_SUFFIXES = ["jr", "sr", "ii", "iii", "iv", "v"]
+
+def normalize_name(pname):
+    """
+    Reduce a player name to a form that survives accents, punctuation,
+    capitalization, and Jr./Sr./III suffixes
+
+    @param pname String name as displayed in a boxscore
+    @return String normalized name
+    """
+    decomposed = unicodedata.normalize("NFKD", pname)
+    plain = "".join(c for c in decomposed if not unicodedata.combining(c))
+    plain = plain.lower().replace(".", " ").replace(",", " ")
+    parts = plain.split()
+    while len(parts) > 1 and parts[-1] in NAME_SUFFIXES:
+        parts = parts[:-1]
+    return " ".join(parts)
+
+def build_name_index(plyr_data):
+    """
+    Index the players in one game by team and normalized name
+
+    @param plyr_data dict of player information indexed by player number
+    @return dict (team, normalized name) -> list of player numbers with
+            that name on that team
+    """
+    index = {}
+    for pkey, pinfo in plyr_data.items():
+        index.setdefault((pinfo['team'], normalize_name(pinfo['name'])),
+                         []).append(pkey)
+    return index
+
+def resolve_name(index, plyr_data, pname, teams):
+    """
+    Find the player number for a name appearing in boxscore text.  Names
+    not in the game's index are looked up in the season wide registry,
+    which also knows the other names a player has been listed under.
+
+    @param index dict returned by build_name_index for plyr_data
+    @param plyr_data dict of player information for the game
+    @param pname String name as it appears in the boxscore text
+    @param teams list of team abbreviations the player may be on
+    @return list of candidate player numbers (one entry if the name is
+            resolved, several if it is ambiguous, empty if it is unknown)
+    """
+    nname = normalize_name(pname)
+    candidates = [pkey for team in teams
+                  for pkey in index.get((team, nname), [])]
+    if not candidates:
+        candidates = [pkey for team in teams
+                      for pkey in registry_lookup(pname, team)
+                      if pkey in plyr_data and
+                      plyr_data[pkey]['team'] == team]
+    if len(candidates) > 1:
+        candidates = [pkey for pkey in candidates
+                      if plyr_data[pkey]['name'] == pname] or candidates
+    return candidates
+
+def load_registry():
+    """
+    Read the registry file (once per process)
+
+    @return dict registry with 'players' and 'names' entries
+    """
+    with REGISTRY_LOCK:
+        if not REGISTRY:
+            players = {}
+            if data_store.exists(REGISTRY_FILE):
+                players = data_store.load(REGISTRY_FILE)
+            REGISTRY['players'] = players
+            REGISTRY['names'] = {}
+            for pkey, pinfo in players.items():
+                for alias in pinfo['aliases']:
+                    REGISTRY['names'].setdefault(alias, set()).add(pkey)
+        return REGISTRY
+
+def registry_lookup(pname, team=None):
+    """
+    Look up a name in the season wide registry
+
+    @param pname String name as it appears in the boxscore text
+    @param team String team abbreviation (None for any team)
+    @return list of player numbers (ints if numeric) known by this name
+    """
+    registry = load_registry()
+    retv = []
+    for pkey in sorted(registry['names'].get(normalize_name(pname), [])):
+        if team and registry['players'][pkey]['team'] != team:
+            continue
+        retv.append(int(pkey) if pkey.isnumeric() else pkey)
+    return retv
+
+def register_players(plyr_data):
+    """
+    Add players seen in a game to the registry and save it
+
+    @param plyr_data dict of player information indexed by player number
+    """
+    registry = load_registry()
+    changed = False
+    with REGISTRY_LOCK:
+        for pkey, pinfo in plyr_data.items():
+            skey = str(pkey)
+            alias = normalize_name(pinfo['name'])
+            entry = registry['players'].setdefault(
+                skey, {"name": pinfo['name'], "team": pinfo['team'],
+                       "aliases": []})
+            if entry['team'] != pinfo['team']:
+                entry['team'] = pinfo['team']
+                changed = True
+            if alias not in entry['aliases']:
+                entry['aliases'].append(alias)
+                registry['names'].setdefault(alias, set()).add(skey)
+                changed = True
+        if changed:
+            data_store.save(REGISTRY_FILE, registry['players'])
@@ -0,0 +1,251 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+roster_history -- Rotisserie rosters for every period stored as the first
+period's snapshot plus per-period add/drop deltas (data/roster_history.json).
+An ownership index answers who owned a player on any date.
+"""
+import os
+import copy
+import bisect
+import hashlib
+import data_store
+
+HISTORY_FILE = os.sep.join(["data", "roster_history.json"])
+SLOTS = ['batters', 'pitchers', 'reserves']
+
+def load_history(hfile=HISTORY_FILE):
+    """
+    Read the roster history
+
+    @param hfile String history file (one per league)
+    @return dict with periods (sorted first days), base (first snapshot),
+            deltas (per period, per team), page_hashes (per period, per
+            team) and owners index
+    """
+    if not data_store.exists(hfile):
+        return {"periods": [], "base": {}, "deltas": {}, "page_hashes": {},
+                "owners": {}}
+    return data_store.load(hfile)
+
+def page_hash(rows):
+    """
+    Hash the roster rows of a team page
+
+    @param rows list of Beautiful Soup playerRow tags
+    @return String hex digest
+    """
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(str(row).encode("utf-8"))
+    return digest.hexdigest()
+
+def diff_rosters(old, new):
+    """
+    Compute the changes between two rosters of the same team
+
+    @param old dict team roster (or None if the team is new)
+    @param new dict team roster
+    @return dict with team_name, adds (slot -> players) and drops (slot ->
+            player numbers)
+    """
+    old = old or {slot: {} for slot in SLOTS}
+    delta = {"team_name": new['team_name'], "adds": {}, "drops": {}}
+    for slot in SLOTS:
+        adds = {pkey: pinfo for pkey, pinfo in new[slot].items()
+                if old[slot].get(pkey) != pinfo}
+        drops = [pkey for pkey in old[slot] if pkey not in new[slot]]
+        if adds:
+            delta["adds"][slot] = adds
+        if drops:
+            delta["drops"][slot] = drops
+    return delta
+
+def apply_delta(roster, delta):
+    """
+    Apply a team delta to a roster
+
+    @param roster dict team roster (updated in place, None if team is new)
+    @param delta dict returned by diff_rosters
+    @return updated roster
+    """
+    if roster is None:
+        roster = {slot: {} for slot in SLOTS}
+    roster['team_name'] = delta['team_name']
+    for slot, drops in delta["drops"].items():
+        for pkey in drops:
+            roster[slot].pop(pkey, None)
+    for slot, adds in delta["adds"].items():
+        roster[slot].update(adds)
+    return roster
+
+def snapshots(history):
+    """
+    Rebuild the full league rosters for each period
+
+    @param history dict returned by load_history
+    @return dict period -> league rosters (same shape as league-*.json)
+    """
+    retv = {}
+    league = {}
+    for period in history["periods"]:
+        if period == history["periods"][0]:
+            league = copy.deepcopy(history["base"])
+        else:
+            league = copy.deepcopy(league)
+            for rteam, delta in history["deltas"][period].items():
+                league[rteam] = apply_delta(league.get(rteam), delta)
+        retv[period] = league
+    return retv
+
+def encode(history, all_snapshots):
+    """
+    Store a set of period snapshots as base + deltas and rebuild the
+    ownership index
+
+    @param history dict returned by load_history (updated in place)
+    @param all_snapshots dict period -> league rosters
+    """
+    periods = sorted(all_snapshots)
+    history["periods"] = periods
+    history["base"] = all_snapshots[periods[0]]
+    history["deltas"] = {}
+    history["owners"] = {}
+    previous = {}
+    for period in periods:
+        league = all_snapshots[period]
+        deltas = {}
+        for rteam, roster in league.items():
+            delta = diff_rosters(previous.get(rteam), roster)
+            if delta["adds"] or delta["drops"]:
+                deltas[rteam] = delta
+        if period != periods[0]:
+            history["deltas"][period] = deltas
+        index_period(history["owners"], period, previous, league)
+        previous = league
+
+def index_period(owners, period, previous, league):
+    """
+    Record ownership changes for one period in the owners index
+
+    @param owners dict player number -> list of [period, team, slot]
+    @param period String first day of the period
+    @param previous dict league rosters for the period before
+    @param league dict league rosters for this period
+    """
+    old_owner = {}
+    for rteam, roster in previous.items():
+        for slot in SLOTS:
+            for pkey in roster[slot]:
+                old_owner[pkey] = [rteam, slot]
+    new_owner = {}
+    for rteam, roster in league.items():
+        for slot in SLOTS:
+            for pkey in roster[slot]:
+                new_owner[pkey] = [rteam, slot]
+    for pkey in set(old_owner) | set(new_owner):
+        owner = new_owner.get(pkey, [None, None])
+        if old_owner.get(pkey, [None, None]) != owner:
+            owners.setdefault(pkey, []).append([period] + owner)
+
+def record_period(period, league, hashes=None, hfile=HISTORY_FILE):
+    """
+    Add a period's rosters to the history.  Appending the latest period
+    only computes one set of deltas; an earlier period re-encodes the
+    history.
+
+    @param period String first day of the period (YYYY-mm-dd)
+    @param league dict league rosters (same shape as league-*.json)
+    @param hashes dict team name -> roster page hash (optional)
+    @param hfile String history file (one per league)
+    """
+    history = load_history(hfile)
+    if hashes:
+        history["page_hashes"][period] = hashes
+    if not history["periods"]:
+        encode(history, {period: league})
+    elif period > history["periods"][-1]:
+        previous = snapshots(history)[history["periods"][-1]]
+        deltas = {}
+        for rteam, roster in league.items():
+            delta = diff_rosters(previous.get(rteam), roster)
+            if delta["adds"] or delta["drops"]:
+                deltas[rteam] = delta
+        history["periods"].append(period)
+        history["deltas"][period] = deltas
+        index_period(history["owners"], period, previous, league)
+    else:
+        all_snapshots = snapshots(history)
+        all_snapshots[period] = league
+        encode(history, all_snapshots)
+    data_store.save(hfile, history)
+
+def period_of(history, cdate):
+    """
+    Find the period a date falls in
+
+    @param history dict returned by load_history
+    @param cdate datetime date
+    @return String first day of the period (None if before the history)
+    """
+    txt_date = cdate.strftime("%Y-%m-%d")
+    indx = bisect.bisect_right(history["periods"], txt_date)
+    if indx == 0:
+        return None
+    return history["periods"][indx - 1]
+
+def roster_on(history, rteam, cdate):
+    """
+    Get a team's roster on a date
+
+    @param history dict returned by load_history
+    @param rteam String Rotisserie team name
+    @param cdate datetime date
+    @return dict team roster (None if the team had no roster then)
+    """
+    period = period_of(history, cdate)
+    if period is None:
+        return None
+    roster = copy.deepcopy(history["base"].get(rteam))
+    for later in history["periods"][1:]:
+        if later > period:
+            break
+        if rteam in history["deltas"][later]:
+            roster = apply_delta(roster, history["deltas"][later][rteam])
+    return roster
+
+def owner_on(history, pkey, cdate):
+    """
+    Find who owned a player on a date
+
+    @param history dict returned by load_history
+    @param pkey String Cbs player number
+    @param cdate datetime date
+    @return tuple (team name, slot), (None, None) if nobody owned him
+    """
+    changes = history["owners"].get(pkey, [])
+    txt_date = cdate.strftime("%Y-%m-%d")
+    indx = bisect.bisect_right([chg[0] for chg in changes], txt_date)
+    if indx == 0:
+        return None, None
+    return changes[indx - 1][1], changes[indx - 1][2]
+
+def latest_rosters(history, cdate):
+    """
+    Get the most recent rosters and page hashes recorded before a date.
+    Used to skip re-parsing team pages that have not changed.
+
+    @param history dict returned by load_history
+    @param cdate datetime date of the period being scraped
+    @return dict with hashes (team name -> page hash) and rosters (team
+            name -> roster)
+    """
+    txt_date = cdate.strftime("%Y-%m-%d")
+    earlier = [period for period in history["periods"] if period < txt_date]
+    if not earlier:
+        return {"hashes": {}, "rosters": {}}
+    league = snapshots(history)[earlier[-1]]
+    return {"hashes": dict(history["page_hashes"].get(earlier[-1], {})),
+            "rosters": {roster['team_name']: roster
+                        for roster in league.values()}}
@@ -0,0 +1,212 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+roto_db -- SQLite storage (data/roto.db) for the data normally kept in
+data/*.json files.  Team abbreviations, roster snapshots, per-game player
+lines and daily Rotisserie joins each get their own indexed table.  The
+Rotisserie teams of a roster snapshot are kept in roto_teams as well as
+in the player rows, so a team without players survives a round trip.
+"""
+import os
+import json
+import sqlite3
+import threading
+
+DB_FILE = os.sep.join(["data", "roto.db"])
+DB_LOCAL = threading.local()
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS teams (
+    dataset TEXT, abbrev TEXT, ord INTEGER, PRIMARY KEY (dataset, abbrev));
+CREATE TABLE IF NOT EXISTS rosters (
+    dataset TEXT, period TEXT, roto_team TEXT, team_name TEXT, slot TEXT,
+    player_id TEXT, name TEXT, position TEXT, mlb_team TEXT, ord INTEGER);
+CREATE INDEX IF NOT EXISTS rosters_dataset ON rosters (dataset);
+CREATE INDEX IF NOT EXISTS rosters_player ON rosters (player_id, period);
+CREATE TABLE IF NOT EXISTS roto_teams (
+    dataset TEXT, period TEXT, roto_team TEXT, team_name TEXT, ord INTEGER,
+    PRIMARY KEY (dataset, roto_team));
+CREATE TABLE IF NOT EXISTS player_lines (
+    dataset TEXT, game_day TEXT, player_id TEXT, mlb_team TEXT, pos TEXT,
+    name TEXT, stats TEXT, ord INTEGER, PRIMARY KEY (dataset, player_id));
+CREATE INDEX IF NOT EXISTS player_lines_player
+    ON player_lines (player_id, game_day);
+CREATE TABLE IF NOT EXISTS daily_joins (
+    dataset TEXT, game_day TEXT, roto_team TEXT, data TEXT, ord INTEGER,
+    PRIMARY KEY (dataset, roto_team));
+CREATE TABLE IF NOT EXISTS documents (dataset TEXT PRIMARY KEY, data TEXT);
+"""
+
+def get_connection():
+    """
+    Get this thread's database connection, creating the schema if needed
+
+    @return sqlite3 connection
+    """
+    if not hasattr(DB_LOCAL, "conn"):
+        conn = sqlite3.connect(DB_FILE, timeout=60)
+        conn.executescript(SCHEMA)
+        DB_LOCAL.conn = conn
+    return DB_LOCAL.conn
+
+def split_name(fname):
+    """
+    Work out which table holds a data file
+
+    @param fname String data file name (data/stats_on_20220414.json etc.)
+    @return tuple (kind, date) where kind is teams, rosters, player_lines,
+            daily_joins or documents and date is the date in the file name
+            (empty if there is none)
+    """
+    base = os.path.basename(fname)[:-len(".json")]
+    if base == "abbreviations":
+        return "teams", ""
+    for prefix, kind in [("league-", "rosters"),
+                         ("stats_on_", "player_lines"),
+                         ("rteams_on_", "daily_joins")]:
+        if base.startswith(prefix):
+            return kind, base[len(prefix):]
+    return "documents", ""
+
+def exists(fname):
+    """
+    Check if a data file has been stored
+
+    @param fname String data file name
+    @return boolean
+    """
+    cur = get_connection().execute(
+        "SELECT 1 FROM datasets WHERE name = ?", (fname,))
+    return cur.fetchone() is not None
+
+def list_files(dirname, prefix=""):
+    """
+    List the data files stored for a directory
+
+    @param dirname String directory the data file names are in
+    @param prefix String only list files whose names start with this
+    @return sorted list of data file names
+    """
+    cur = get_connection().execute("SELECT name FROM datasets")
+    return sorted(name for (name,) in cur
+                  if os.path.dirname(name) == os.path.normpath(dirname) and
+                  os.path.basename(name).startswith(prefix))
+
+def remove(fname):
+    """
+    Delete a data file
+
+    @param fname String data file name
+    """
+    kind, _ = split_name(fname)
+    conn = get_connection()
+    with conn:
+        conn.execute(f"DELETE FROM {kind} WHERE dataset = ?", (fname,))
+        if kind == "rosters":
+            conn.execute("DELETE FROM roto_teams WHERE dataset = ?",
+                         (fname,))
+        conn.execute("DELETE FROM datasets WHERE name = ?", (fname,))
+
+def save(fname, data):
+    """
+    Store a data file in one transaction, replacing any earlier version
+
+    @param fname String data file name
+    @param data json serializable contents of the file
+    """
+    kind, fdate = split_name(fname)
+    conn = get_connection()
+    with conn:
+        conn.execute(f"DELETE FROM {kind} WHERE dataset = ?", (fname,))
+        if kind == "teams":
+            conn.executemany("INSERT INTO teams VALUES (?, ?, ?)",
+                             [(fname, abbrev, ordv) for ordv, abbrev
+                              in enumerate(data)])
+        elif kind == "rosters":
+            conn.execute("DELETE FROM roto_teams WHERE dataset = ?",
+                         (fname,))
+            conn.executemany("INSERT INTO roto_teams VALUES (?,?,?,?,?)",
+                             [(fname, fdate, rteam, tinfo['team_name'], ordv)
+                              for ordv, (rteam, tinfo)
+                              in enumerate(data.items())])
+            conn.executemany(
+                "INSERT INTO rosters VALUES (?,?,?,?,?,?,?,?,?,?)",
+                roster_rows(fname, fdate, data))
+        elif kind == "player_lines":
+            conn.executemany(
+                "INSERT INTO player_lines VALUES (?,?,?,?,?,?,?,?)",
+                [(fname, fdate, str(pkey), pinfo['team'], pinfo['pos'],
+                  pinfo['name'], json.dumps(pinfo), ordv)
+                 for ordv, (pkey, pinfo) in enumerate(data.items())])
+        elif kind == "daily_joins":
+            conn.executemany("INSERT INTO daily_joins VALUES (?,?,?,?,?)",
+                             [(fname, fdate, rteam, json.dumps(tinfo), ordv)
+                              for ordv, (rteam, tinfo)
+                              in enumerate(data.items())])
+        else:
+            conn.execute("INSERT INTO documents VALUES (?, ?)",
+                         (fname, json.dumps(data)))
+        conn.execute("INSERT OR IGNORE INTO datasets VALUES (?)", (fname,))
+
+def roster_rows(fname, period, rleague):
+    """
+    Flatten a league-*.json structure into rosters table rows
+
+    @param fname String data file name
+    @param period String first day of the period
+    @param rleague dict rosters indexed by Rotisserie team
+    @return list of row tuples
+    """
+    rows = []
+    for rteam, tinfo in rleague.items():
+        for slot in ['batters', 'pitchers', 'reserves']:
+            for pkey, pinfo in tinfo[slot].items():
+                rows.append((fname, period, rteam, tinfo['team_name'], slot,
+                             pkey, pinfo['name'], pinfo['position'],
+                             pinfo['team'], len(rows)))
+    return rows
+
+def load(fname):
+    """
+    Read a data file back in the same shape it has as a json file
+
+    @param fname String data file name
+    @return contents of the data file
+    """
+    if not exists(fname):
+        raise FileNotFoundError(fname)
+    kind, _ = split_name(fname)
+    conn = get_connection()
+    if kind == "teams":
+        cur = conn.execute("SELECT abbrev FROM teams WHERE dataset = ? "
+                           "ORDER BY ord", (fname,))
+        return [row[0] for row in cur]
+    if kind == "rosters":
+        rleague = {}
+        cur = conn.execute("SELECT roto_team, team_name FROM roto_teams "
+                           "WHERE dataset = ? ORDER BY ord", (fname,))
+        for rteam, tname in cur:
+            rleague[rteam] = {'batters': {}, 'pitchers': {}, 'reserves': {},
+                              'team_name': tname}
+        cur = conn.execute(
+            "SELECT roto_team, team_name, slot, player_id, name, position, "
+            "mlb_team FROM rosters WHERE dataset = ? ORDER BY ord", (fname,))
+        for rteam, tname, slot, pkey, name, position, mlb_team in cur:
+            tinfo = rleague.setdefault(rteam, {'batters': {}, 'pitchers': {},
+                                               'reserves': {},
+                                               'team_name': tname})
+            tinfo[slot][pkey] = {"position": position, "team": mlb_team,
+                                 "name": name}
+        return rleague
+    if kind == "player_lines":
+        cur = conn.execute("SELECT player_id, stats FROM player_lines "
+                           "WHERE dataset = ? ORDER BY ord", (fname,))
+        return {pkey: json.loads(stats) for pkey, stats in cur}
+    if kind == "daily_joins":
+        cur = conn.execute("SELECT roto_team, data FROM daily_joins "
+                           "WHERE dataset = ? ORDER BY ord", (fname,))
+        return {rteam: json.loads(tinfo) for rteam, tinfo in cur}
+    cur = conn.execute("SELECT data FROM documents WHERE dataset = ?",
+                       (fname,))
+    return json.loads(cur.fetchone()[0])
@@ -0,0 +1,238 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+Serve the team and free agent pages from the data files instead of
+writing html_files_<date> directories.  Usage:
+
+    python roto_server.py [--port PORT] [--pages N] [--ldir DIR]
+
+Pages:
+
+    /                          list of dates with rteams_on_*.json files
+    /YYYYmmdd/                 links to the pages for a date
+    /YYYYmmdd/<team>.html      a team page (same file names gen_html_files
+                               uses)
+    /YYYYmmdd/free_agent_batters.html, /YYYYmmdd/free_agent_pitchers.html
+
+Pages are rendered on request with the gen_html_files builders and kept in
+a bounded LRU cache.  A page's ETag is derived from the hashes of the data
+files it is built from, so a cached page is rendered again only when one
+of those files changes, and a browser holding the current version gets a
+304.  Responses are gzipped when the browser accepts it.
+"""
+import os
+import html
+import gzip
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from gen_html_files import team_jobs, free_agent_jobs, render_job
+from get_roto_teams import get_weekly_league_file
+import data_store
+
+SERVER_SETTINGS = {"ldir": "data", "max_pages": 64}
+PAGE_CACHE = OrderedDict()
+PAGE_LOCK = threading.Lock()
+FREE_AGENT_VIEWS = {"free_agent_batters": 0, "free_agent_pitchers": 1}
+
+def view_inputs(day, view):
+    """
+    List the data files a view is built from
+
+    @param day datetime date shown
+    @param view String page name (team file name, free agent page name,
+           or index)
+    @return list of data file names
+    """
+    ldir = SERVER_SETTINGS["ldir"]
+    txt_day = day.strftime("%Y%m%d")
+    if view in FREE_AGENT_VIEWS:
+        return [os.sep.join(["data", f"stats_on_{txt_day}.json"]),
+                get_weekly_league_file(day, ldir),
+                os.sep.join([ldir, "abbreviations.json"])]
+    return [os.sep.join([ldir, f"rteams_on_{txt_day}.json"])]
+
+def view_etag(day, view):
+    """
+    Compute the ETag of a view from the hashes of its data files
+
+    @param day datetime date shown
+    @param view String page name
+    @return String quoted ETag (None if a data file is missing)
+    """
+    digest = hashlib.sha256(f"{day:%Y%m%d}/{view}".encode("utf-8"))
+    for fname in view_inputs(day, view):
+        fhash = data_store.digest(fname)
+        if fhash is None:
+            return None
+        digest.update(fhash.encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+def date_index(day):
+    """
+    Render the list of pages for a date
+
+    @param day datetime date shown
+    @return String html page
+    """
+    txt_day = day.strftime("%Y%m%d")
+    jobs = team_jobs(day, SERVER_SETTINGS["ldir"])
+    links = [f'<li><a href="/{txt_day}/{quote(job[0])}.html">'
+             f'{html.escape(rteam)}</a></li>' for rteam, job in jobs.items()]
+    for view in FREE_AGENT_VIEWS:
+        links.append(f'<li><a href="/{txt_day}/{view}.html">'
+                     f'{view.replace("_", " ").title()}</a></li>')
+    return (f"<html><head><title>{day:%A - %B %d, %Y}</title></head><body>"
+            f"<h1>{day:%A - %B %d, %Y}</h1><ul>{''.join(links)}</ul>"
+            "</body></html>")
+
+def render_view(day, view):
+    """
+    Render a view
+
+    @param day datetime date shown
+    @param view String page name
+    @return String html page (None if there is no such team)
+    """
+    if view == "index":
+        return date_index(day)
+    ndate = day.strftime("%A - %B %d, %Y")
+    if view in FREE_AGENT_VIEWS:
+        jobs = free_agent_jobs(ndate, day, SERVER_SETTINGS["ldir"])
+        return render_job(jobs[FREE_AGENT_VIEWS[view]])
+    for job in team_jobs(day, SERVER_SETTINGS["ldir"]).values():
+        if job[0] == view:
+            return render_job(job)
+    return None
+
+def cached_view(day, view, etag):
+    """
+    Get a rendered view from the LRU cache, rendering it if the cached copy
+    is missing or was built from older data
+
+    @param day datetime date shown
+    @param view String page name
+    @param etag String current ETag of the view
+    @return tuple (bytes page, bytes gzipped page), or None if there is no
+            such page
+    """
+    key = (day.strftime("%Y%m%d"), view)
+    with PAGE_LOCK:
+        entry = PAGE_CACHE.get(key)
+        if entry and entry["etag"] == etag:
+            PAGE_CACHE.move_to_end(key)
+            return entry["body"], entry["gzip"]
+    page = render_view(day, view)
+    if page is None:
+        return None
+    body = page.encode("utf-8")
+    zbody = gzip.compress(body)
+    with PAGE_LOCK:
+        PAGE_CACHE[key] = {"etag": etag, "body": body, "gzip": zbody}
+        PAGE_CACHE.move_to_end(key)
+        while len(PAGE_CACHE) > SERVER_SETTINGS["max_pages"]:
+            PAGE_CACHE.popitem(last=False)
+    return body, zbody
+
+def list_dates():
+    """
+    Render the list of dates that have pages
+
+    @return String html page
+    """
+    days = [os.path.basename(fname)[len("rteams_on_"):-len(".json")]
+            for fname in reversed(data_store.list_files(
+                SERVER_SETTINGS["ldir"], "rteams_on_"))]
+    links = "".join(f'<li><a href="/{txt_day}/">{txt_day}</a></li>'
+                    for txt_day in days)
+    return f"<html><body><ul>{links}</ul></body></html>"
+
+class RotoHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for the page server
+    """
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serve a page
+        """
+        parts = [unquote(part) for part in self.path.split("?")[0].split("/")
+                 if part]
+        if not parts:
+            self.send_page(list_dates().encode("utf-8"), None)
+            return
+        try:
+            day = datetime.strptime(parts[0], "%Y%m%d")
+        except ValueError:
+            self.send_error(404)
+            return
+        view = "index"
+        if len(parts) > 1:
+            view = parts[1][:-len(".html")] if parts[1].endswith(
+                ".html") else parts[1]
+        etag = view_etag(day, view) if len(parts) < 3 else None
+        if etag is None:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        pages = cached_view(day, view, etag)
+        if pages is None:
+            self.send_error(404)
+            return
+        self.send_page(pages[0], etag, pages[1])
+
+    def send_page(self, body, etag, zbody=None):
+        """
+        Send a page, gzipped if the browser accepts it
+
+        @param body bytes page
+        @param etag String ETag (None to send none)
+        @param zbody bytes gzipped page (compressed here if None)
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = zbody if zbody is not None else gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port=8000, max_pages=64, ldir="data"):
+    """
+    Run the page server on localhost until interrupted
+
+    @param port int port number
+    @param max_pages int number of rendered pages kept in memory
+    @param ldir String directory holding the league's data files
+    """
+    SERVER_SETTINGS["max_pages"] = max_pages
+    SERVER_SETTINGS["ldir"] = ldir
+    server = ThreadingHTTPServer(("127.0.0.1", port), RotoHandler)
+    print(f"Serving on http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--ldir", default="data")
+    args = parser.parse_args()
+    serve(args.port, args.pages, args.ldir)
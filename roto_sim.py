@@ -0,0 +1,241 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+roto_sim -- Rotisserie standings and lineup what-ifs.  Totals the stats of
+every team's active players over a range of days (using the rosters of
+each day's period), scores the ten categories (R, RBI, HR, SB, AVG, W, SV,
+ERA, WHIP, K/9) with rank points, and evaluates player swaps in numpy
+batches, every candidate's standings at once.  Usage:
+
+    python roto_sim.py YYYY-mm-dd YYYY-mm-dd "Team Name" [--top N]
+"""
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+from get_roto_teams import get_weekly_league_file
+from free_agent_rank import day_stats
+from stat_store import BAT_FIELDS, PIT_FIELDS
+from batch_stats import ratio
+import data_store
+
+FIELDS = list(BAT_FIELDS) + list(PIT_FIELDS)
+FINDEX = {field: indx for indx, field in enumerate(FIELDS)}
+CATEGORIES = [("R", ["runs"], None, 1, True),
+              ("RBI", ["rbis"], None, 1, True),
+              ("HR", ["hr"], None, 1, True),
+              ("SB", ["sb"], None, 1, True),
+              ("AVG", ["hits"], "ab", 1, True),
+              ("W", ["win"], None, 1, True),
+              ("SV", ["save"], None, 1, True),
+              ("ERA", ["earned_runs"], "outs", 27, False),
+              ("WHIP", ["walks", "hits_allowed"], "outs", 3, False),
+              ("K/9", ["strikeouts"], "outs", 27, True)]
+SWAP_BATCH = 2048
+
+def stat_vector(pstats):
+    """
+    Convert one day's stats for a player into a vector over FIELDS
+
+    @param pstats dict player stats from a stats_on_*.json file
+    @return numpy array
+    """
+    vec = np.zeros(len(FIELDS))
+    fmap = PIT_FIELDS if 'save' in pstats else BAT_FIELDS
+    for field, src in fmap.items():
+        vec[FINDEX[field]] = int(pstats[src])
+    return vec
+
+def collect_totals(start, end, ldir="data"):
+    """
+    Total team and player stats over a range of days
+
+    @param start datetime first day
+    @param end datetime last day
+    @param ldir String directory holding the league's data files
+    @return dict with teams (team names), totals (teams x FIELDS array),
+            contrib ((team, player number) -> vector of what the player
+            added to the team), players (player number -> vector of all
+            his stats), info (player number -> name, team, kind) and
+            rosters (league rosters on the last day)
+    """
+    rosters = {}
+    teams = []
+    contrib = {}
+    players = {}
+    info = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        rosters = data_store.load(get_weekly_league_file(day, ldir))
+        for rteam in rosters:
+            if rteam not in teams:
+                teams.append(rteam)
+        precords = day_stats(day.strftime("%Y%m%d"))
+        for pkey, pstats in precords.items():
+            vec = stat_vector(pstats)
+            players[pkey] = players.get(pkey, 0) + vec
+            kind = 'pitchers' if 'save' in pstats else 'batters'
+            info[pkey] = {"name": pstats['name'], "team": pstats['team'],
+                          "kind": kind}
+        for rteam, roster in rosters.items():
+            for slot in ['batters', 'pitchers']:
+                for pkey in roster[slot]:
+                    if pkey in precords and info[pkey]["kind"] == slot:
+                        key = (rteam, pkey)
+                        contrib[key] = (contrib.get(key, 0) +
+                                        stat_vector(precords[pkey]))
+    totals = np.zeros((len(teams), len(FIELDS)))
+    for (rteam, _), vec in contrib.items():
+        totals[teams.index(rteam)] += vec
+    return {"teams": teams, "totals": totals, "contrib": contrib,
+            "players": players, "info": info, "rosters": rosters}
+
+def category_values(totals):
+    """
+    Compute the category values for arrays of team totals
+
+    @param totals numpy array (..., teams, FIELDS)
+    @return numpy array (..., teams, categories)
+    """
+    values = []
+    for _, numer, denom, scale, _ in CATEGORIES:
+        top = sum(totals[..., FINDEX[field]] for field in numer)
+        if denom is None:
+            values.append(top)
+        else:
+            values.append(ratio(top, totals[..., FINDEX[denom]], scale))
+    return np.stack(values, axis=-1)
+
+def rank_points(values):
+    """
+    Give rank points in each category: the best team gets one point per
+    team, the worst one point, and ties split the points.  A rate with no
+    playing time (nan) ranks last.
+
+    @param values numpy array (..., teams, categories)
+    @return numpy array of points, same shape as values
+    """
+    higher = np.array([cat[4] for cat in CATEGORIES])
+    score = np.where(higher, values, -values)
+    score = np.where(np.isnan(score), -np.inf, score)
+    mine = score[..., :, None, :]
+    theirs = score[..., None, :, :]
+    below = (theirs < mine).sum(axis=-2)
+    ties = (theirs == mine).sum(axis=-2) - 1
+    return 1 + below + 0.5 * ties
+
+def standings(sim):
+    """
+    Rotisserie standings
+
+    @param sim dict returned by collect_totals
+    @return list of (team name, total points, dict category -> points),
+            best first
+    """
+    points = rank_points(category_values(sim["totals"]))
+    retv = []
+    for indx, rteam in enumerate(sim["teams"]):
+        retv.append((rteam, float(points[indx].sum()),
+                     {cat[0]: float(points[indx, cindx])
+                      for cindx, cat in enumerate(CATEGORIES)}))
+    return sorted(retv, key=lambda x: -x[1])
+
+def check_team(sim, rteam):
+    """
+    Make sure a team name is one of the simulated teams
+
+    @param sim dict returned by collect_totals
+    @param rteam String Rotisserie team name
+    """
+    if rteam not in sim["teams"] or rteam not in sim["rosters"]:
+        raise ValueError(f"Unknown team {rteam!r}.  Teams are: " +
+                         ", ".join(sorted(sim["rosters"])))
+
+def candidate_swaps(sim, rteam):
+    """
+    List every swap of one of a team's active players for a free agent of
+    the same kind (batter for batter, pitcher for pitcher)
+
+    @param sim dict returned by collect_totals
+    @param rteam String Rotisserie team name
+    @return list of (player number dropped, player number added)
+    """
+    check_team(sim, rteam)
+    owned = set()
+    for roster in sim["rosters"].values():
+        for slot in ['batters', 'pitchers', 'reserves']:
+            owned.update(roster[slot])
+    retv = []
+    for slot in ['batters', 'pitchers']:
+        free = [pkey for pkey, pinfo in sim["info"].items()
+                if pinfo["kind"] == slot and pkey not in owned]
+        for out_key in sim["rosters"][rteam][slot]:
+            retv.extend((out_key, in_key) for in_key in free)
+    return retv
+
+def evaluate_swaps(sim, rteam, swaps):
+    """
+    Compute a team's total points after each swap.  The dropped player's
+    contribution to the team is replaced by everything the added player
+    did over the range, and all the standings are rescored in batches.
+
+    @param sim dict returned by collect_totals
+    @param rteam String Rotisserie team name
+    @param swaps list of (player number dropped, player number added)
+    @return numpy array of the team's total points, one per swap
+    """
+    check_team(sim, rteam)
+    tindx = sim["teams"].index(rteam)
+    zero = np.zeros(len(FIELDS))
+    deltas = np.zeros((len(swaps), len(FIELDS)))
+    for indx, (out_key, in_key) in enumerate(swaps):
+        deltas[indx] = (sim["players"].get(in_key, zero) -
+                        sim["contrib"].get((rteam, out_key), zero))
+    retv = []
+    for first in range(0, len(swaps), SWAP_BATCH):
+        batch = deltas[first:first + SWAP_BATCH]
+        cand = np.repeat(sim["totals"][None], len(batch), axis=0)
+        cand[:, tindx, :] += batch
+        points = rank_points(category_values(cand))
+        retv.append(points[:, tindx, :].sum(axis=-1))
+    if not retv:
+        return np.zeros(0)
+    return np.concatenate(retv)
+
+def best_swaps(sim, rteam, top=10):
+    """
+    Find the swaps that gain a team the most points
+
+    @param sim dict returned by collect_totals
+    @param rteam String Rotisserie team name
+    @param top int number of swaps returned
+    @return list of (points gained, player number dropped, player number
+            added), best first
+    """
+    swaps = candidate_swaps(sim, rteam)
+    current = dict((name, pts) for name, pts, _ in standings(sim))[rteam]
+    points = evaluate_swaps(sim, rteam, swaps)
+    order = np.argsort(-points, kind="stable")[:top]
+    return [(float(points[indx]) - current, swaps[indx][0], swaps[indx][1])
+            for indx in order]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("start")
+    parser.add_argument("end")
+    parser.add_argument("team")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    simv = collect_totals(datetime.strptime(args.start, "%Y-%m-%d"),
+                          datetime.strptime(args.end, "%Y-%m-%d"))
+    try:
+        check_team(simv, args.team)
+    except ValueError as exc:
+        parser.error(str(exc))
+    for tname, tpoints, _ in standings(simv):
+        print(f"{tpoints:6.1f} {tname}")
+    for gain, dropped, added in best_swaps(simv, args.team, args.top):
+        dname = simv["info"].get(dropped, {"name": dropped})["name"]
+        print(f"{gain:+5.1f} drop {dname} add "
+              f"{simv['info'][added]['name']}")
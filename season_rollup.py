@@ -0,0 +1,151 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+season_rollup -- keep running season and period totals for players and
+Rotisserie teams in data/season_rollup.json.  Each day's stats_on_*.json
+file is folded in once.  What a day added is kept in
+data/rollup_on_YYYYmmdd.json and the rollup records a hash of the day's
+stats and league files, so a day whose files were corrected is backed out
+and folded in again.
+"""
+import os
+from get_roto_teams import get_weekly_league_file
+from batch_stats import team_rates
+import data_store
+
+ROLLUP_FILE = os.sep.join(["data", "season_rollup.json"])
+BAT_FIELDS = ["ab", "runs", "hits", "rbis", "hr", "sb"]
+PIT_FIELDS = ["outs", "hits", "earned_runs", "walks", "strikeouts", "win",
+              "save"]
+
+def load_rollup():
+    """
+    Read the rollup file
+
+    @return dict with days folded in so far (YYYYmmdd -> hash of the
+            day's input files) and player, team, and period totals
+    """
+    if not data_store.exists(ROLLUP_FILE):
+        return {"days": {}, "players": {}, "teams": {}, "periods": {}}
+    rollup = data_store.load(ROLLUP_FILE)
+    if isinstance(rollup['days'], list):
+        rollup['days'] = dict.fromkeys(rollup['days'])
+    return rollup
+
+def save_rollup(rollup):
+    """
+    Write the rollup file
+
+    @param rollup dict returned by load_rollup
+    """
+    data_store.save(ROLLUP_FILE, rollup)
+
+def get_owners(rleague):
+    """
+    Map active players to the Rotisserie team that owns them
+
+    @param rleague dict contents of a league-*.json file
+    @return dict player number -> Rotisserie team name
+    """
+    owners = {}
+    for rteam in rleague:
+        for ptype in ['batters', 'pitchers']:
+            for pkey in rleague[rteam][ptype]:
+                owners[pkey] = rteam
+    return owners
+
+def add_stats(totals, day_stats, sign=1):
+    """
+    Add a player's stats for one day into a totals dict
+
+    @param totals dict running totals (updated in place)
+    @param day_stats dict player stats from a stats_on_*.json file
+    @param sign int 1 to add the stats, -1 to take them back out
+    """
+    fields = PIT_FIELDS if 'save' in day_stats else BAT_FIELDS
+    for field in fields:
+        totals[field] = totals.get(field, 0) + sign * int(day_stats[field])
+    totals['games'] = totals.get('games', 0) + sign
+
+def apply_day(rollup, contrib, sign=1):
+    """
+    Add one day's contribution into the rollup totals (or take it out)
+
+    @param rollup dict returned by load_rollup (updated in place)
+    @param contrib dict with period, players (player number -> day
+           stats) and owners (player number -> Rotisserie team name)
+    @param sign int 1 to add the day, -1 to back it out
+    """
+    period_teams = rollup['periods'].setdefault(contrib['period'], {})
+    for pkey, day_stats in contrib['players'].items():
+        ptype = 'pitching' if 'save' in day_stats else 'batting'
+        player = rollup['players'].setdefault(
+            pkey, {"name": day_stats['name'], "batting": {},
+                   "pitching": {}})
+        add_stats(player[ptype], day_stats, sign)
+        if pkey in contrib['owners']:
+            rteam = contrib['owners'][pkey]
+            for tgroup in [rollup['teams'], period_teams]:
+                team = tgroup.setdefault(rteam, {"batting": {},
+                                                 "pitching": {}})
+                add_stats(team[ptype], day_stats, sign)
+
+def fold_day(rday, rollup=None):
+    """
+    Fold one day of stats into the rollup.  Players are credited to the
+    Rotisserie team that had them active during that day's period.  Days
+    already folded in from the same stats and league files are skipped; a
+    day whose files changed is backed out and folded in again.  Days
+    folded in before contributions were kept are left alone (remove the
+    rollup file and backfill to rebuild them).
+
+    @param rday datetime day being added
+    @param rollup dict returned by load_rollup (read and saved here if
+           None; callers folding many days pass it and save it once)
+    @return dict updated rollup
+    """
+    keep = rollup is None
+    if keep:
+        rollup = load_rollup()
+    txt_rday = rday.strftime("%Y%m%d")
+    day_data = os.sep.join(["data", f"stats_on_{txt_rday}.json"])
+    lfile = get_weekly_league_file(rday)
+    inputs = f"{data_store.digest(day_data)}/{data_store.digest(lfile)}"
+    if txt_rday in rollup['days']:
+        if rollup['days'][txt_rday] in (inputs, None):
+            return rollup
+        apply_day(rollup, data_store.load(contrib_file(txt_rday)), -1)
+    precords = data_store.load(day_data)
+    owners = get_owners(data_store.load(lfile))
+    period = os.path.basename(lfile)[len("league-"):-len(".json")]
+    contrib = {"period": period, "players": precords,
+               "owners": {pkey: owners[pkey] for pkey in precords
+                          if pkey in owners}}
+    apply_day(rollup, contrib)
+    data_store.save(contrib_file(txt_rday), contrib)
+    rollup['days'][txt_rday] = inputs
+    if keep:
+        save_rollup(rollup)
+    return rollup
+
+def contrib_file(txt_rday):
+    """
+    Get the name of the file holding what a day added to the rollup
+
+    @param txt_rday String YYYYmmdd
+    @return String data file name
+    """
+    return os.sep.join(["data", f"rollup_on_{txt_rday}.json"])
+
+def season_team_rates(rollup=None):
+    """
+    Compute AVG, ERA, WHIP and K/9 (and adjusted versions) for every
+    Rotisserie team's season totals
+
+    @param rollup dict returned by load_rollup (read here if None)
+    @return dict team name -> dict of rate stats
+    """
+    if rollup is None:
+        rollup = load_rollup()
+    return team_rates(rollup['teams'])
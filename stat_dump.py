@@ -0,0 +1,237 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+stat_dump -- stats source that reads a local game log dump instead of
+boxscore pages.  The dump is a CSV file (with a header line) or a JSON
+lines file (one object per line) holding one row per player per game:
+
+    date        YYYY-mm-dd or YYYYmmdd
+    player_id   the dump's own player id (mapped to a Cbs player number)
+    cbs_id      Cbs player number (optional, used instead of the mapping)
+    name, team, pos
+    kind        bat or pit
+    ab, runs, hits, rbis, hr, sb                   (batting lines)
+    outs or ip, hits, runs, earned_runs, walks,
+    strikeouts, win, save                          (pitching lines)
+
+Dump player ids are mapped to Cbs player numbers through the mapping
+table in data/cbs_id_map.json ({"player_id": cbs number, ...}); ids not
+in the table are looked up by name and team in the player registry (a unique
+match is added to the table), and players that still cannot be placed
+are reported and skipped.  The whole dump is read in one pass and split
+by day.  A date outside the dates the dump covers is an error rather than
+a day without games.  Usage:
+
+    python stat_dump.py DUMP_FILE [YYYY-mm-dd YYYY-mm-dd]
+
+writes data/stats_on_YYYYmmdd.json for every day in the dump (or in the
+range) that does not have one yet.
+"""
+import os
+import csv
+import json
+import argparse
+import threading
+from datetime import datetime
+from configparser import ConfigParser
+from get_day_stats import make_player_entry
+from player_registry import registry_lookup, register_players
+import data_store
+
+DUMP_SETTINGS = {"id_map": os.sep.join(["data", "cbs_id_map.json"])}
+DUMP_LOCK = threading.Lock()
+DUMP_DAYS = {}
+
+def get_dump_file():
+    """
+    Get the dump file named in roto.ini (stats_dump key)
+
+    @return String dump file name
+    """
+    if "dump_file" not in DUMP_SETTINGS:
+        config = ConfigParser()
+        config.read('roto.ini')
+        DUMP_SETTINGS["dump_file"] = config["DEFAULT"].get(
+            "stats_dump", os.sep.join(["data", "stats_dump.csv"]))
+    return DUMP_SETTINGS["dump_file"]
+
+def read_rows(dump_file):
+    """
+    Stream the rows of a dump file
+
+    @param dump_file String CSV or JSON lines file name
+    @return generator of dicts, one per player per game
+    """
+    with open(dump_file, "r", encoding="utf8", newline="") as dfile:
+        if dump_file.lower().endswith(".csv"):
+            yield from csv.DictReader(dfile)
+            return
+        for line in dfile:
+            if line.strip():
+                yield json.loads(line)
+
+def row_value(row, field):
+    """
+    Read a counting stat from a dump row (blank or missing counts as 0)
+
+    @param row dict dump row
+    @param field String column name
+    @return int
+    """
+    value = row.get(field)
+    if value in (None, "", "-"):
+        return 0
+    return int(value)
+
+def row_outs(row):
+    """
+    Read the outs recorded by a pitcher, from the outs column or from
+    innings pitched in box score form (6.2 is six and two thirds)
+
+    @param row dict dump row
+    @return int
+    """
+    if row.get("outs") not in (None, ""):
+        return int(row["outs"])
+    inn_inf = str(row.get("ip") or "0").split(".")
+    return int(inn_inf[0]) * 3 + (int(inn_inf[1]) if len(inn_inf) > 1
+                                  else 0)
+
+def row_to_rline(row, pkey):
+    """
+    Lay a dump row out like a boxscore table row (the rline used by
+    get_day_stats) so that make_player_entry builds the record
+
+    @param row dict dump row
+    @param pkey Cbs player number
+    @return tuple (rline, pit_mode)
+    """
+    if row["kind"] == "pit":
+        pname = row["name"]
+        if row_value(row, "win"):
+            pname += " (W)"
+        elif row_value(row, "save"):
+            pname += " (S)"
+        outs = row_outs(row)
+        return [pkey, pname, f"{outs // 3}.{outs % 3}",
+                row_value(row, "hits"), row_value(row, "runs"),
+                row_value(row, "earned_runs"), row_value(row, "walks"),
+                row_value(row, "strikeouts")], True
+    return [pkey, f"{row['name']} {row['pos']}", row_value(row, "ab"),
+            row_value(row, "runs"), row_value(row, "hits"),
+            row_value(row, "rbis"), str(row_value(row, "hr"))], False
+
+def map_player(row, id_map, unplaced):
+    """
+    Find the Cbs player number for a dump row.  A player found by name
+    and team in the registry is added to id_map.
+
+    @param row dict dump row
+    @param id_map dict dump player id -> Cbs player number (updated in
+           place)
+    @param unplaced set of dump player ids already reported
+    @return int Cbs player number (None if the player cannot be placed)
+    """
+    if row.get("cbs_id") not in (None, ""):
+        return int(row["cbs_id"])
+    pid = str(row.get("player_id", ""))
+    if pid in id_map:
+        return int(id_map[pid])
+    candidates = registry_lookup(row["name"], row["team"])
+    if len(candidates) == 1:
+        id_map[pid] = candidates[0]
+        return candidates[0]
+    if pid not in unplaced:
+        unplaced.add(pid)
+        print(f"{row['name']} ({pid}): no Cbs player number, skipped")
+    return None
+
+def read_dump(dump_file, start=None, end=None):
+    """
+    Read a dump in one pass into per day stats records
+
+    @param dump_file String CSV or JSON lines file name
+    @param start datetime first day kept (optional)
+    @param end datetime last day kept (optional)
+    @return dict YYYYmmdd -> dict indexed by Cbs player number of the
+            records make_player_entry produces for that day (as in the
+            boxscores, a player's pitching line wins over his batting line)
+    """
+    id_map = {}
+    if data_store.exists(DUMP_SETTINGS["id_map"]):
+        id_map = {str(key): value for key, value in
+                  data_store.load(DUMP_SETTINGS["id_map"]).items()}
+    known = len(id_map)
+    first = start.strftime("%Y%m%d") if start else ""
+    last = end.strftime("%Y%m%d") if end else "99999999"
+    unplaced = set()
+    days = {}
+    for row in read_rows(dump_file):
+        txt_day = str(row["date"]).replace("-", "")
+        if not first <= txt_day <= last:
+            continue
+        pkey = map_player(row, id_map, unplaced)
+        if pkey is None:
+            continue
+        rline, pit_mode = row_to_rline(row, pkey)
+        record = make_player_entry(rline, pit_mode, row["team"])
+        if not pit_mode:
+            record['sb'] = row_value(row, "sb")
+        day = days.setdefault(txt_day, {})
+        if pit_mode or 'save' not in day.get(pkey, {}):
+            day[pkey] = record
+    if len(id_map) > known:
+        data_store.save(DUMP_SETTINGS["id_map"], id_map)
+    return days
+
+def day_records(game_date):
+    """
+    Stats source adapter: get a day's records from the dump named in
+    roto.ini.  The dump is read once per process and kept by day.  A day
+    between the first and last dates of the dump without rows is a day
+    without games.
+
+    @param game_date datetime date of games
+    @return dict indexed by Cbs player number of this day's stats
+    """
+    with DUMP_LOCK:
+        if not DUMP_DAYS:
+            DUMP_DAYS.update(read_dump(get_dump_file()))
+    txt_day = game_date.strftime("%Y%m%d")
+    if not DUMP_DAYS or not min(DUMP_DAYS) <= txt_day <= max(DUMP_DAYS):
+        raise ValueError(f"{get_dump_file()} has no games for "
+                         f"{game_date.strftime('%Y-%m-%d')}")
+    return DUMP_DAYS.get(txt_day, {})
+
+def import_dump(dump_file, start=None, end=None):
+    """
+    Write the stats files for every day in a dump that does not have one
+
+    @param dump_file String CSV or JSON lines file name
+    @param start datetime first day written (optional)
+    @param end datetime last day written (optional)
+    @return list of YYYYmmdd days written
+    """
+    written = []
+    for txt_day, records in sorted(read_dump(dump_file, start, end).items()):
+        ofilen = os.sep.join(["data", f"stats_on_{txt_day}.json"])
+        if data_store.exists(ofilen):
+            continue
+        register_players(records)
+        data_store.save(ofilen, records)
+        written.append(txt_day)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("dump_file")
+    parser.add_argument("start", nargs="?")
+    parser.add_argument("end", nargs="?")
+    args = parser.parse_args()
+    for wday in import_dump(
+            args.dump_file,
+            datetime.strptime(args.start, "%Y-%m-%d") if args.start else None,
+            datetime.strptime(args.end, "%Y-%m-%d") if args.end else None):
+        print("Wrote", wday)
@@ -0,0 +1,135 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+stat_store -- columnar season stat store in data/stat_store.  Each stat
+field is a numpy array (players x days + 1) of running sums saved as a
+.npy file that is opened memory-mapped, so the total for any date range is
+one subtraction per player.
+"""
+import os
+import json
+from datetime import datetime, timedelta
+import numpy as np
+import data_store
+
+STORE_DIR = os.sep.join(["data", "stat_store"])
+BAT_FIELDS = {"ab": "ab", "runs": "runs", "hits": "hits", "rbis": "rbis",
+              "hr": "hr", "sb": "sb"}
+PIT_FIELDS = {"outs": "outs", "hits_allowed": "hits",
+              "earned_runs": "earned_runs", "walks": "walks",
+              "strikeouts": "strikeouts", "win": "win", "save": "save"}
+FIELDS = list(BAT_FIELDS) + list(PIT_FIELDS) + ["games"]
+
+def build_store(start, end):
+    """
+    Import every data/stats_on_*.json file from start through end into the
+    store, replacing any store that is already there
+
+    @param start datetime first day of the store
+    @param end datetime last day of the store
+    @return dict store (see open_store)
+    """
+    ndays = (end - start).days + 1
+    day_records = []
+    players = {}
+    for offset in range(ndays):
+        txt_day = (start + timedelta(days=offset)).strftime("%Y%m%d")
+        day_data = os.sep.join(["data", f"stats_on_{txt_day}.json"])
+        precords = {}
+        if data_store.exists(day_data):
+            precords = data_store.load(day_data)
+        for pkey, day_stats in precords.items():
+            if pkey not in players:
+                players[pkey] = {"row": len(players),
+                                 "name": day_stats['name'],
+                                 "team": day_stats['team']}
+        day_records.append(precords)
+    daily = {field: np.zeros((len(players), ndays + 1), dtype=np.int32)
+             for field in FIELDS}
+    for offset, precords in enumerate(day_records):
+        for pkey, day_stats in precords.items():
+            row = players[pkey]["row"]
+            fmap = PIT_FIELDS if 'save' in day_stats else BAT_FIELDS
+            for field, src in fmap.items():
+                daily[field][row, offset + 1] = int(day_stats[src])
+            daily["games"][row, offset + 1] = 1
+    os.makedirs(STORE_DIR, exist_ok=True)
+    for field in FIELDS:
+        np.save(os.sep.join([STORE_DIR, f"{field}.npy"]),
+                np.cumsum(daily[field], axis=1, dtype=np.int32))
+    index = {"start": start.strftime("%Y%m%d"), "days": ndays,
+             "players": sorted(players, key=lambda p: players[p]["row"]),
+             "info": players}
+    with open(os.sep.join([STORE_DIR, "index.json"]), "w",
+              encoding="utf8") as ifile:
+        json.dump(index, ifile, indent=4)
+    return open_store()
+
+def open_store():
+    """
+    Open the store.  Field arrays are memory-mapped, not read.
+
+    @return dict with 'index' (index.json contents), 'rows' (player number
+            -> row) and 'fields' (field name -> memory-mapped prefix sums)
+    """
+    with open(os.sep.join([STORE_DIR, "index.json"]), "r",
+              encoding="utf8") as ifile:
+        index = json.load(ifile)
+    fields = {}
+    for field in FIELDS:
+        fields[field] = np.load(os.sep.join([STORE_DIR, f"{field}.npy"]),
+                                mmap_mode="r")
+    rows = {pkey: row for row, pkey in enumerate(index["players"])}
+    return {"index": index, "rows": rows, "fields": fields}
+
+def day_offsets(store, start, end):
+    """
+    Convert a date range into prefix sum column numbers
+
+    @param store dict returned by open_store
+    @param start datetime first day of range
+    @param end datetime last day of range
+    @return tuple (first, last) columns; last - first is the range length
+    """
+    base = datetime.strptime(store["index"]["start"], "%Y%m%d")
+    ndays = store["index"]["days"]
+    first = min(max((start - base).days, 0), ndays)
+    last = min(max((end - base).days + 1, 0), ndays)
+    return first, max(first, last)
+
+def range_totals(store, field, start, end):
+    """
+    Total a stat over a date range for every player
+
+    @param store dict returned by open_store
+    @param field String stat name (one of FIELDS)
+    @param start datetime first day of range
+    @param end datetime last day of range
+    @return numpy array of totals, one entry per store player row
+    """
+    first, last = day_offsets(store, start, end)
+    prefix = store["fields"][field]
+    return prefix[:, last] - prefix[:, first]
+
+def player_totals(store, pkey, start, end):
+    """
+    Total all stats over a date range for one player
+
+    @param store dict returned by open_store
+    @param pkey String Cbs player number
+    @param start datetime first day of range
+    @param end datetime last day of range
+    @return dict stat name -> total (empty if the player is not stored)
+    """
+    if pkey not in store["rows"]:
+        return {}
+    row = store["rows"][pkey]
+    first, last = day_offsets(store, start, end)
+    return {field: int(prefix[row, last] - prefix[row, first])
+            for field, prefix in store["fields"].items()}
+
+if __name__ == "__main__":
+    import sys
+    build_store(datetime.strptime(sys.argv[1], "%Y-%m-%d"),
+                datetime.strptime(sys.argv[2], "%Y-%m-%d"))
@@ -0,0 +1,389 @@
+# (c) 2022 Warren Usui
+# Rotisserie league code
+# This code is licensed under the MIT license (see LICENSE.txt for details)
+"""
+synthetic_data -- generate fake but realistically shaped Cbs pages (MLB
+scoreboards and boxscores, league standings and team roster pages) and the
+matching data files so the scraping and page generating code can be run
+without network access.  Pages are written into the page cache, where
+page_fetch reads them in offline mode.  Everything is derived from a seed
+so runs are repeatable.
+"""
+import os
+import random
+from datetime import timedelta
+from page_fetch import write_cache, NEVER_EXPIRES
+from get_roto_teams import get_weekly_league_file
+import data_store
+
+MLB_TEAMS = ["ARI", "ATL", "BAL", "BOS", "CHC", "CHW", "CIN", "CLE", "COL",
+             "DET", "HOU", "KC", "LAA", "LAD", "MIA", "MIL", "MIN", "NYM",
+             "NYY", "OAK", "PHI", "PIT", "SD", "SEA", "SF", "STL", "TB",
+             "TEX", "TOR", "WAS"]
+FIRST_NAMES = ["Aaron", "Bobby", "Carlos", "Dylan", "Eloy", "Freddie",
+               "Gleyber", "Hunter", "Ian", "José", "Kyle", "Luis", "Manny",
+               "Nelson", "Ozzie", "Pete", "Rafael", "Shohei", "Trea",
+               "Vladimir", "Willy", "Yordan", "Zack"]
+LAST_NAMES = ["Acuña", "Betts", "Correa", "Devers", "Escobar", "Freeman",
+              "García", "Harper", "Judge", "Kirk", "Lindor", "Machado",
+              "Núñez", "Ohtani", "Peña", "Ramírez", "Soto", "Tatis",
+              "Urías", "Vargas", "Walker", "Yelich", "Zimmer"]
+SUFFIXES = ["", "", "", "", "", "", " Jr.", " II"]
+POSITIONS = ["C", "1B", "2B", "3B", "SS", "LF", "CF", "RF", "DH"]
+BATTERS_PER_TEAM = 13
+PITCHERS_PER_TEAM = 13
+ROTO_BATTERS = 14
+ROTO_PITCHERS = 9
+ROTO_RESERVES = 2
+BOX_URL = "/mlb/gametracker/boxscore/MLB_{day}_{away}@{home}/"
+
+def make_mlb_teams(nteams):
+    """
+    Pick the MLB team abbreviations used
+
+    @param nteams int number of teams (up to 30)
+    @return list of team abbreviations
+    """
+    return MLB_TEAMS[:nteams]
+
+def make_players(mlb_teams, seed=0):
+    """
+    Create the players on every MLB team
+
+    @param mlb_teams list of team abbreviations
+    @param seed int random seed
+    @return dict player number (int) -> dict with name, team and pos ('P'
+            for pitchers)
+    """
+    rng = random.Random(seed)
+    players = {}
+    for tindx, team in enumerate(mlb_teams):
+        for pindx in range(BATTERS_PER_TEAM + PITCHERS_PER_TEAM):
+            pkey = 2000000 + tindx * 100 + pindx
+            name = (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                    f"{rng.choice(SUFFIXES)}")
+            pos = "P"
+            if pindx < BATTERS_PER_TEAM:
+                pos = POSITIONS[pindx % len(POSITIONS)]
+            players[pkey] = {"name": name, "team": team, "pos": pos}
+    return players
+
+def short_name(name):
+    """
+    Abbreviate a name the way boxscores do (J. Smith)
+
+    @param name String full name
+    @return String boxscore name
+    """
+    parts = name.split(" ")
+    return " ".join([parts[0][0] + "."] + parts[1:])
+
+def player_link(pkey, name):
+    """
+    Build the player link used in boxscores
+
+    @param pkey int player number
+    @param name String player name
+    @return String href
+    """
+    slug = "-".join(name.lower().replace(".", "").split())
+    return f"/mlb/players/{pkey}/{slug}/"
+
+def team_roster(players, team):
+    """
+    Split a team's players into batters and pitchers
+
+    @param players dict returned by make_players
+    @param team String team abbreviation
+    @return tuple (list of batter numbers, list of pitcher numbers)
+    """
+    batters = [pkey for pkey, pinfo in players.items()
+               if pinfo['team'] == team and pinfo['pos'] != 'P']
+    pitchers = [pkey for pkey, pinfo in players.items()
+                if pinfo['team'] == team and pinfo['pos'] == 'P']
+    return batters, pitchers
+
+def make_schedule(day, mlb_teams, games, seed=0):
+    """
+    Pair teams into the games played on a day
+
+    @param day datetime date of games
+    @param mlb_teams list of team abbreviations
+    @param games int number of games (at most half the teams)
+    @param seed int random seed
+    @return list of (away, home) tuples
+    """
+    rng = random.Random(f"{seed}-{day:%Y%m%d}")
+    order = list(mlb_teams)
+    rng.shuffle(order)
+    games = min(games, len(order) // 2)
+    return [(order[2 * gindx], order[2 * gindx + 1])
+            for gindx in range(games)]
+
+def batting_table(rng, players, lineup):
+    """
+    Build a boxscore batting table
+
+    @param rng random.Random object
+    @param players dict returned by make_players
+    @param lineup list of player numbers that batted
+    @return tuple (String html table, list of (name, count) stolen bases)
+    """
+    rows = ["<table><tr><th>HITTERS</th><th>AB</th><th>R</th><th>H</th>"
+            "<th>RBI</th><th>HR</th><th>BB</th><th>K</th></tr>"]
+    steals = []
+    for indx, pkey in enumerate(lineup):
+        pinfo = players[pkey]
+        name = short_name(pinfo['name'])
+        prefix = "a- " if indx >= 9 else ""
+        atbats = rng.randint(0, 5)
+        hits = rng.randint(0, atbats)
+        homers = rng.randint(0, min(hits, 1))
+        vals = [atbats, rng.randint(0, hits + 1), hits, rng.randint(0, 3),
+                homers, rng.randint(0, 2), rng.randint(0, atbats)]
+        cells = "".join(f"<td>{val}</td>" for val in vals)
+        rows.append(f'<tr><td>{prefix}<a href="{player_link(pkey, name)}">'
+                    f'{name}</a> {pinfo["pos"]}</td>{cells}</tr>')
+        if hits and rng.random() < 0.1:
+            steals.append((name, rng.choice([1, 1, 1, 2])))
+    rows.append("</table>")
+    return "".join(rows), steals
+
+def pitching_table(rng, players, staff):
+    """
+    Build a boxscore pitching table
+
+    @param rng random.Random object
+    @param players dict returned by make_players
+    @param staff list of player numbers that pitched
+    @return String html table
+    """
+    rows = ["<table><tr><th>PITCHERS</th><th>IP</th><th>H</th><th>R</th>"
+            "<th>ER</th><th>BB</th><th>K</th></tr>"]
+    for indx, pkey in enumerate(staff):
+        name = short_name(players[pkey]['name'])
+        decision = ""
+        if indx == 0 and rng.random() < 0.5:
+            decision = " (W, 3-2)"
+        elif indx == len(staff) - 1 and indx and rng.random() < 0.3:
+            decision = " (S, 4)"
+        outs = rng.randint(1, 18) if indx == 0 else rng.randint(0, 6)
+        hits = rng.randint(0, outs // 2 + 1)
+        runs = rng.randint(0, hits + 1)
+        vals = [f"{outs // 3}.{outs % 3}", hits, runs,
+                rng.randint(0, runs), rng.randint(0, 3),
+                rng.randint(0, outs // 2 + 1)]
+        cells = "".join(f"<td>{val}</td>" for val in vals)
+        rows.append(f'<tr><td><a href="{player_link(pkey, name)}">{name}'
+                    f'</a>{decision}</td>{cells}</tr>')
+    rows.append("</table>")
+    return "".join(rows)
+
+def baserunning_text(steals):
+    """
+    Build a BASERUNNING section
+
+    @param steals list of (name, count) tuples
+    @return String html (empty if nobody stole a base)
+    """
+    if not steals:
+        return ""
+    sbtxt = ", ".join(f"{name} {count} (5)" if count > 1 else f"{name} (5)"
+                      for name, count in steals)
+    return (f"<div><h4>BASERUNNING</h4><p><b>SB</b> - {sbtxt}.</p>"
+            "<p><b>CS</b> - None.</p></div>")
+
+def boxscore_page(day, away, home, players, seed=0):
+    """
+    Build a boxscore page laid out like the Cbs pages read by
+    get_day_stats.extract_raw_data (line score and batting/pitching
+    tables alternating, then the BASERUNNING notes shown twice)
+
+    @param day datetime date of game
+    @param away String visiting team abbreviation
+    @param home String home team abbreviation
+    @param players dict returned by make_players
+    @param seed int random seed
+    @return bytes page text
+    """
+    rng = random.Random(f"{seed}-{day:%Y%m%d}-{away}@{home}")
+    bat_tables = []
+    pit_tables = []
+    notes = []
+    for team in [away, home]:
+        batters, pitchers = team_roster(players, team)
+        lineup = batters[:9] + rng.sample(batters[9:], rng.randint(0, 2))
+        staff = rng.sample(pitchers, rng.randint(1, 4))
+        btable, steals = batting_table(rng, players, lineup)
+        bat_tables.append(btable)
+        pit_tables.append(pitching_table(rng, players, staff))
+        notes.append(baserunning_text(steals))
+    filler = "<table><tr><td>-</td></tr></table>"
+    body = "".join([filler, bat_tables[0], filler, bat_tables[1], filler,
+                    pit_tables[0], filler, pit_tables[1]])
+    page = (f"<html><head><title>{away} @ {home}</title></head><body>"
+            f"<div class='boxscore'>{body}</div>"
+            f"<div class='notes'>{''.join(notes)}</div>"
+            f"<div class='notes-mobile'>{''.join(notes)}</div>"
+            "</body></html>")
+    return page.encode("utf-8")
+
+def scoreboard_page(day, schedule):
+    """
+    Build a scoreboard page
+
+    @param day datetime date of games
+    @param schedule list of (away, home) tuples
+    @return bytes page text
+    """
+    cards = []
+    for away, home in schedule:
+        link = BOX_URL.format(day=day.strftime("%Y%m%d"), away=away,
+                              home=home)
+        cards.append(f'<div class="single-score-card postgame">'
+                     f'<span>{away} 3 {home} 2 Final</span>'
+                     f'<a href="{link}">Box Score</a>'
+                     f'<a href="{link}">Recap</a></div>')
+    return ("<html><body>" + "".join(cards) +
+            "</body></html>").encode("utf-8")
+
+def make_league(players, nroto, seed=0):
+    """
+    Draft players onto Rotisserie teams
+
+    @param players dict returned by make_players
+    @param nroto int number of Rotisserie teams
+    @param seed int random seed
+    @return dict team name -> list of player numbers (batters, then
+            pitchers, then reserves, in page order)
+    """
+    rng = random.Random(f"{seed}-league")
+    batters = [pkey for pkey, pinfo in players.items() if pinfo['pos'] != 'P']
+    pitchers = [pkey for pkey, pinfo in players.items()
+                if pinfo['pos'] == 'P']
+    rng.shuffle(batters)
+    rng.shuffle(pitchers)
+    league = {}
+    for tindx in range(nroto):
+        tname = f"Team {tindx + 1} {rng.choice(LAST_NAMES)}'s"
+        needed = ROTO_BATTERS + ROTO_RESERVES
+        roster = [batters.pop() for _ in range(min(needed, len(batters)))]
+        roster[ROTO_BATTERS:ROTO_BATTERS] = [
+            pitchers.pop() for _ in range(min(ROTO_PITCHERS, len(pitchers)))]
+        league[tname] = roster
+    return league
+
+def team_page(roster, players):
+    """
+    Build a Rotisserie team page with the playerRow rows read by
+    get_roto_teams.parse_players
+
+    @param roster list of player numbers in page order
+    @param players dict returned by make_players
+    @return bytes page text
+    """
+    rows = []
+    for pkey in roster:
+        pinfo = players[pkey]
+        rows.append(f'<tr class="playerRow"><td><a class="playerLink" '
+                    f'href="/players/playerpage/{pkey}">{pinfo["name"]}</a>'
+                    f'<span class="playerPositionAndTeam">{pinfo["pos"]} | '
+                    f'{pinfo["team"]}</span></td></tr>')
+    return ("<html><body><table>" + "".join(rows) +
+            "</table></body></html>").encode("utf-8")
+
+def standings_page(league):
+    """
+    Build a league standings page
+
+    @param league dict returned by make_league
+    @return bytes page text
+    """
+    links = "".join(f'<a href="/teams/{tindx + 1}">{tname}</a>'
+                    for tindx, tname in enumerate(league))
+    return f"<html><body>{links}</body></html>".encode("utf-8")
+
+def league_rosters(league, players):
+    """
+    Build the contents of a league-*.json file
+
+    @param league dict returned by make_league
+    @param players dict returned by make_players
+    @return dict in the format saved by get_league_team_data
+    """
+    retv = {}
+    for tname, roster in league.items():
+        team = {'batters': {}, 'pitchers': {}, 'reserves': {},
+                'team_name': tname}
+        for indx, pkey in enumerate(roster):
+            pinfo = players[pkey]
+            rkey = 'pitchers' if pinfo['pos'] == 'P' else 'batters'
+            if indx >= ROTO_BATTERS + ROTO_PITCHERS:
+                rkey = 'reserves'
+            team[rkey][str(pkey)] = {"position": pinfo['pos'],
+                                     "team": pinfo['team'],
+                                     "name": pinfo['name']}
+        retv[tname] = team
+    return retv
+
+def cache_page(url, content):
+    """
+    Store a generated page in the page cache as a response that never
+    expires
+
+    @param url String address of page
+    @param content bytes page text
+    """
+    write_cache(url, {"url": url, "etag": None, "last_modified": None,
+                      "fetched": 0, "ttl": NEVER_EXPIRES}, content)
+
+def make_season(start, ndays, nteams=30, games=15, nroto=12,
+                league="synthetic", seed=0):
+    """
+    Write the pages and data files for a run of days into the current
+    directory's data directory and page cache
+
+    @param start datetime first day
+    @param ndays int number of days
+    @param nteams int number of MLB teams
+    @param games int games played each day
+    @param nroto int number of Rotisserie teams
+    @param league String league name used in the standings and team urls
+    @param seed int random seed
+    @return dict with days (list of datetimes), boxscores (day ->
+            list of links), standings (url) and team_pages (list of
+            (team name, url))
+    """
+    os.makedirs("data", exist_ok=True)
+    mlb_teams = make_mlb_teams(nteams)
+    players = make_players(mlb_teams, seed)
+    rleague = make_league(players, nroto, seed)
+    data_store.save(os.sep.join(["data", "abbreviations.json"]), mlb_teams)
+    site = f"https://{league}.cbssports.com"
+    standings = f"{site}/standings/overall"
+    cache_page(standings, standings_page(rleague))
+    team_pages = []
+    for tindx, (tname, roster) in enumerate(rleague.items()):
+        turl = f"{site}/teams/{tindx + 1}"
+        cache_page(turl, team_page(roster, players))
+        team_pages.append((tname, turl))
+    retv = {"days": [], "boxscores": {}, "standings": standings,
+            "team_pages": team_pages}
+    for offset in range(ndays):
+        day = start + timedelta(days=offset)
+        lfile = get_weekly_league_file(day)
+        if not data_store.exists(lfile):
+            data_store.save(lfile, league_rosters(rleague, players))
+        schedule = make_schedule(day, mlb_teams, games, seed)
+        gday = day.strftime("%Y%m%d")
+        cache_page(f"https://www.cbssports.com/mlb/scoreboard/{gday}/",
+                   scoreboard_page(day, schedule))
+        links = []
+        for away, home in schedule:
+            link = BOX_URL.format(day=gday, away=away, home=home)
+            cache_page("https://www.cbssports.com" + link,
+                       boxscore_page(day, away, home, players, seed))
+            links.append(link)
+        retv["days"].append(day)
+        retv["boxscores"][day] = links
+    return retv
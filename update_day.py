@@ -1,34 +1,67 @@
 # Rotisserie league code
 # This code is licensed under the MIT license (see LICENSE.txt for details)
 """
-Get yesterday's stats for all teams
+Get yesterday's stats for all teams.  Usage:
+
+    python update_day.py [YYYY-mm-dd] [--force STAGE ...]
+                         [--dry-run [STAGE ...]] [--offline]
+                         [--metrics FILE] [--profile cpu|memory]
+
+--dry-run reports whether the named stages (every stage if none are
+named) would run without running them.  --offline renders pages from the
+saved data files (scraping only what is missing, from the page cache)
+without any network access.
 """
+import argparse
 from datetime import datetime, timedelta
-from get_team_abbrev import get_teams_list
-from get_roto_teams import get_league_team_data
-from get_day_stats import get_players_on_date
-from get_daily_roto_scores import get_daily_roto_scores
-from gen_html_files import gen_html_files
+from pipeline import run_pipeline
+import metrics
 
-def complete_yesterday():
+def complete_yesterday(force=(), dry_run=(), offline=False):
     """
     Call get_info_for_day with yesterday's date
+
+    @param force list of stage names to rerun
+    @param dry_run list of stage names that only report whether they
+           would run ('all' for every stage)
+    @param offline boolean no network access
     """
     today = datetime.now()
     yesterday = today - timedelta(days=1)
-    get_info_for_day(yesterday)
+    get_info_for_day(yesterday, force, dry_run, offline)
 
-def get_info_for_day(test_day):
+def get_info_for_day(test_day, force=(), dry_run=(), offline=False):
     """
     Produce files needed to check results for a day
 
     @param test_day date value of day being checked
+    @param force list of stage names to rerun (teams, rosters, games,
+           stats, join, rollup, html or all)
+    @param dry_run list of stage names that only report whether they
+           would run ('all' for every stage)
+    @param offline boolean no network access
     """
-    get_teams_list()
-    get_league_team_data(test_day)
-    get_players_on_date(test_day)
-    get_daily_roto_scores(test_day)
-    gen_html_files(test_day)
+    run_pipeline(test_day, force, dry_run, offline=offline)
 
 if __name__ == "__main__":
-    complete_yesterday()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("day", nargs="?")
+    parser.add_argument("--force", nargs="*", default=[])
+    parser.add_argument("--dry-run", nargs="*")
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--metrics", default=metrics.METRICS_FILE)
+    parser.add_argument("--profile", choices=["cpu", "memory"])
+    args = parser.parse_args()
+    if args.dry_run == []:
+        args.dry_run = ["all"]
+    args.dry_run = args.dry_run or []
+    try:
+        if args.day:
+            metrics.profile_call(args.profile, get_info_for_day,
+                                 datetime.strptime(args.day, "%Y-%m-%d"),
+                                 args.force, args.dry_run, args.offline)
+        else:
+            metrics.profile_call(args.profile, complete_yesterday,
+                                 args.force, args.dry_run, args.offline)
+    finally:
+        metrics.write_metrics(args.metrics)